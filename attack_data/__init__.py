@@ -0,0 +1 @@
+# Data loading and analysis helpers shared by the Streamlit pages
@@ -0,0 +1,135 @@
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from attack_data.relationships import KEY_COLUMNS
+
+NAME_COLUMNS = ['target name', 'source name']
+
+
+# Name counts of one relationship slice, sorted by descending count so a threshold
+# is a binary search and the result a prefix of the arrays. Ties are ordered by name, so a
+# patched table comes out in the same order as one counted from scratch.
+class CountTable:
+    def __init__(self, series=None, counts=None):
+        if counts is None:
+            counts = series.value_counts()
+        counts = counts.sort_index(kind='stable').sort_values(ascending=False, kind='stable')
+        self.names = counts.index.to_numpy()
+        self.counts = counts.to_numpy()
+        self._descending = -self.counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    # Number of names with a count >= min_count (> min_count when strict)
+    def cutoff(self, min_count=0, strict=False):
+        return int(np.searchsorted(self._descending, -min_count, side='left' if strict else 'right'))
+
+    def frame(self, name_label, count_label, min_count=0, strict=False):
+        stop = self.cutoff(min_count, strict)
+        return pd.DataFrame({name_label: self.names[:stop], count_label: self.counts[:stop]})
+
+    def series(self):
+        return pd.Series(self.counts, index=self.names)
+
+    # Table with per-name count changes ({name: delta}) applied, names that drop to zero removed
+    def patched(self, delta):
+        positions = {name: position for position, name in enumerate(self.names)}
+        counts = self.counts.copy()
+        new_names, new_counts = [], []
+        for name, change in delta.items():
+            position = positions.get(name)
+            if position is None:
+                new_names.append(name)
+                new_counts.append(change)
+            else:
+                counts[position] += change
+        names = np.concatenate([self.names.astype(object), np.array(new_names, dtype=object)])
+        counts = np.concatenate([counts, np.array(new_counts, dtype=counts.dtype)])
+        keep = counts > 0
+        return CountTable(counts=pd.Series(counts[keep], index=names[keep]))
+
+
+# Materialized counts of the relationships sheet by (mapping type, target type, source type, name),
+# built once per dataset from the relationship index. None in a key means "any".
+class AggregateCube:
+    def __init__(self, index, tables=None):
+        self.index = index
+        self._tables = {}
+        self._pairs = {}
+        self._lock = threading.Lock()
+        if tables is not None:
+            self._tables = tables
+            return
+
+        keys = set()
+        for key in index._offsets:
+            if len(key) == len(KEY_COLUMNS):
+                mapping_type, target_type, source_type = key
+                keys.update([key, (mapping_type, target_type, None), (None, target_type, None)])
+        for key in keys:
+            rows = index.slice(*key)
+            for column in NAME_COLUMNS:
+                self._tables[key + (column,)] = CountTable(rows[column])
+
+    def table(self, mapping_type=None, target_type=None, column='target name', source_type=None):
+        table = self._tables.get((mapping_type, target_type, source_type, column))
+        if table is None:
+            table = CountTable(pd.Series([], dtype=object))
+        return table
+
+    # Count table of `column` as a DataFrame, optionally thresholded
+    def counts(self, mapping_type=None, target_type=None, column='target name', source_type=None,
+               name_label='name', count_label='count', min_count=0, strict=False):
+        return self.table(mapping_type, target_type, column, source_type).frame(name_label, count_label, min_count, strict)
+
+    # Counts of target names per source name within one slice, e.g. techniques per campaign
+    def counts_for_source(self, source_name, mapping_type, target_type, source_type=None,
+                          name_label='name', count_label='count'):
+        key = (mapping_type, target_type, source_type)
+        with self._lock:
+            pairs = self._pairs.get(key)
+        if pairs is None:
+            rows = self.index.slice(*key)
+            pairs = {name: CountTable(group['target name']) for name, group in rows.groupby('source name', sort=False)}
+            # Sessions share the cube, the first table built is the one kept
+            with self._lock:
+                pairs = self._pairs.setdefault(key, pairs)
+        table = pairs.get(source_name)
+        if table is None:
+            return pd.DataFrame({name_label: [], count_label: []})
+        return table.frame(name_label, count_label)
+
+    # Cube of a new release built from this one: only the tables the outgoing and incoming
+    # relationship rows touch are recounted, the rest are shared
+    def updated(self, index, outgoing, incoming):
+        deltas = {}
+        for rows, sign in ((outgoing, -1), (incoming, 1)):
+            for (key, column, name), count in _key_counts(rows).items():
+                delta = deltas.setdefault(key + (column,), {})
+                delta[name] = delta.get(name, 0) + sign * count
+
+        tables = dict(self._tables)
+        for key, delta in deltas.items():
+            table = tables.get(key)
+            if table is None:
+                table = CountTable(counts=pd.Series([], dtype='int64'))
+            tables[key] = table.patched(delta)
+        return AggregateCube(index, tables)
+
+
+# Name counts of some relationship rows under every key the cube stores
+def _key_counts(rows):
+    keys = rows[KEY_COLUMNS].astype(object)
+    keys = keys.where(keys.notna(), None).to_numpy()
+    counts = Counter()
+    for column in NAME_COLUMNS:
+        for (mapping_type, target_type, source_type), name in zip(keys, rows[column].to_numpy()):
+            if pd.isna(name):
+                continue
+            for key in ((mapping_type, target_type, source_type), (mapping_type, target_type, None), (None, target_type, None)):
+                counts[key, column, name] += 1
+    return counts
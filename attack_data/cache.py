@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import threading
+
+# pyarrow is optional, without it every sheet is parsed from the workbook
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+# Location of the converted workbooks, one sub-directory per content hash
+CACHE_DIR = os.environ.get(
+    "ATTACK_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".attack_cache"),
+)
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 5
+
+
+# Read the raw bytes of an uploaded file or a path on disk
+def file_bytes(file):
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            return f.read()
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    position = file.tell()
+    file.seek(0)
+    data = file.read()
+    file.seek(position)
+    return data
+
+
+# Hash of the workbook content, used as the key of the columnar store
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_path(key):
+    return os.path.join(CACHE_DIR, key)
+
+
+def _sheet_file(index):
+    # Sheet names may contain characters that are not valid in file names
+    return f"sheet_{index:02d}.feather"
+
+
+# Temporary name of a file being written, unique per process and thread: the report workers
+# and several app processes may write the same store
+def _tmp_name(file_name):
+    return f"{file_name}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def read_manifest(key):
+    path = os.path.join(cache_path(key), MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("hash") != key:
+        return None
+    return manifest
+
+
+# The manifest lists every sheet of the workbook in order, with the feather file of the
+# sheets converted so far. It is replaced atomically after each sheet is written, so a
+# half-written file is never referenced.
+def write_manifest(key, names, files):
+    directory = cache_path(key)
+    os.makedirs(directory, exist_ok=True)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "hash": key,
+        "sheets": [{"name": name, "file": files.get(name)} for name in names],
+    }
+    tmp_path = os.path.join(directory, _tmp_name(MANIFEST_NAME))
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_NAME))
+
+
+# Arrow needs a single type per column, mixed object columns are stored as text. The
+# copy is shallow, only the columns replaced here are new.
+def _arrow_safe(df):
+    df = df.copy(deep=False)
+    df.columns = [str(column) for column in df.columns]
+    for column in df.columns:
+        if df[column].dtype == object:
+            values = df[column].dropna()
+            if values.map(type).nunique() > 1:
+                df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    return df
+
+
+# Write one sheet to the store and return its file name
+def store_sheet(key, index, df):
+    directory = cache_path(key)
+    os.makedirs(directory, exist_ok=True)
+    file_name = _sheet_file(index)
+    tmp_path = os.path.join(directory, _tmp_name(file_name))
+    # Uncompressed so the next load reads the sheet without decompressing it
+    feather.write_feather(_arrow_safe(df), tmp_path, compression="uncompressed")
+    os.replace(tmp_path, os.path.join(directory, file_name))
+    return file_name
+
+
+def read_cached_sheet(key, file_name):
+    path = os.path.join(cache_path(key), file_name)
+    return feather.read_table(path).to_pandas()
+
+
+# Store every sheet of an already parsed dataset, e.g. one built from a STIX bundle
+def store_workbook(key, sheets):
+    if feather is None:
+        return
+    names = list(sheets)
+    files = {name: store_sheet(key, index, sheets[name]) for index, name in enumerate(names)}
+    write_manifest(key, names, files)
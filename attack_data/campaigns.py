@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+# Row x column counts (campaigns against the techniques or tactics of their relationships),
+# counted for every row at once with one groupby and stored as CSR
+class CountMatrix:
+    def __init__(self, rows, columns, matrix):
+        self.rows = list(rows)
+        self.columns = list(columns)
+        self.matrix = matrix.tocsr()
+        self._row_positions = {name: position for position, name in enumerate(self.rows)}
+
+    @classmethod
+    def from_pairs(cls, rows, columns):
+        pairs = pd.DataFrame({'row': rows.to_numpy(), 'column': columns.to_numpy()}).dropna()
+        counts = pairs.groupby(['row', 'column'], sort=False).size()
+        row_codes, row_names = pd.factorize(counts.index.get_level_values('row'))
+        column_codes, column_names = pd.factorize(counts.index.get_level_values('column'))
+        matrix = sparse.csr_matrix(
+            (counts.to_numpy(dtype=np.int64), (row_codes, column_codes)),
+            shape=(len(row_names), len(column_names)),
+        )
+        return cls(row_names, column_names, matrix)
+
+    def __contains__(self, name):
+        return name in self._row_positions
+
+    def positions(self, names):
+        return np.array([self._row_positions[name] for name in names if name in self._row_positions], dtype=np.int64)
+
+    # Non-zero counts of one row, largest first
+    def counts(self, name, name_label='name', count_label='count'):
+        position = self._row_positions.get(name)
+        if position is None:
+            return pd.DataFrame({name_label: [], count_label: []})
+        row = self.matrix.getrow(position)
+        order = np.argsort(-row.data, kind='stable')
+        return pd.DataFrame({
+            name_label: [self.columns[i] for i in row.indices[order]],
+            count_label: row.data[order],
+        })
+
+    # Dense table of the selected rows over the columns any of them has, the columns with
+    # the largest totals first
+    def frame(self, names):
+        positions = self.positions(names)
+        rows = self.matrix[positions]
+        totals = np.asarray(rows.sum(axis=0)).ravel()
+        used = np.flatnonzero(totals)
+        used = used[np.argsort(-totals[used], kind='stable')]
+        return pd.DataFrame(
+            rows[:, used].toarray(),
+            index=[self.rows[i] for i in positions],
+            columns=[self.columns[i] for i in used],
+        )
+
+
+# Technique and tactic counts of every campaign, from the campaign 'uses' technique rows.
+# A technique listed under several tactics counts once for each of them.
+class CampaignAnalytics:
+    def __init__(self, rows, techniques):
+        self.campaigns = list(rows['source name'].dropna().unique())
+        self.techniques = CountMatrix.from_pairs(rows['source name'], rows['target name'])
+
+        tactics = techniques[['ID', 'tactics']].dropna().rename(columns={'ID': 'target ID'})
+        tactics = tactics.assign(tactics=tactics['tactics'].str.split(', ')).explode('tactics')
+        with_tactics = rows[['source name', 'target ID']].merge(tactics, on='target ID')
+        self.tactics = CountMatrix.from_pairs(with_tactics['source name'], with_tactics['tactics'])
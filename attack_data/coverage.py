@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Relationship types that cover a technique, with the source type they come from
+COVERAGE_TYPES = {
+    'detects': 'datacomponent',
+    'mitigates': 'mitigation',
+}
+# Threat profiles whose gap tables are kept per dataset
+MAX_CACHED_PROFILES = 64
+
+
+# Group -> technique, data component -> technique and mitigation -> technique matrices
+# over one shared technique axis (keyed by ID), so the coverage of any set of groups is a
+# sparse product and its gaps a set difference of technique columns.
+class CoverageMatrix:
+    def __init__(self, index):
+        slices = {'uses': index.slice('uses', 'technique', 'group')}
+        for mapping_type, source_type in COVERAGE_TYPES.items():
+            slices[mapping_type] = index.slice(mapping_type, 'technique', source_type)
+
+        pairs = pd.concat([rows[['target ID', 'target name']] for rows in slices.values()], ignore_index=True)
+        pairs = pairs.dropna(subset=['target ID']).drop_duplicates('target ID')
+        self.techniques = pd.Index(sorted(pairs['target ID']))
+        self.technique_names = pairs.set_index('target ID')['target name'].reindex(self.techniques).to_numpy()
+
+        self.sources = {}
+        self.matrices = {}
+        for mapping_type, rows in slices.items():
+            self.sources[mapping_type], self.matrices[mapping_type] = self._binary(rows)
+        self.groups = self.sources['uses']
+        self._group_positions = {name: position for position, name in enumerate(self.groups)}
+        # Number of data components / mitigations covering each technique
+        self.covering = {mapping_type: np.asarray(self.matrices[mapping_type].sum(axis=0)).ravel().astype(int)
+                         for mapping_type in COVERAGE_TYPES}
+
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _binary(self, rows):
+        rows = rows.dropna(subset=['source name', 'target ID'])
+        row_codes, names = pd.factorize(rows['source name'], sort=True)
+        column_codes = self.techniques.get_indexer(rows['target ID'])
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (row_codes, column_codes)),
+            shape=(len(names), len(self.techniques)),
+        )
+        # Repeated relationships count once
+        matrix.data[:] = 1
+        return list(names), matrix
+
+    # Number of groups of the profile using each technique
+    def profile_usage(self, groups):
+        positions = [self._group_positions[group] for group in groups if group in self._group_positions]
+        return np.asarray(self.matrices['uses'][positions].sum(axis=0)).ravel().astype(int)
+
+    # Techniques used by the groups of a profile with the number of data components and
+    # mitigations covering each, cached per profile
+    def profile(self, groups):
+        key = frozenset(groups)
+        with self._lock:
+            if key in self._profiles:
+                self._profiles.move_to_end(key)
+                return self._profiles[key]
+
+        usage = self.profile_usage(groups)
+        used = np.flatnonzero(usage)
+        table = pd.DataFrame({
+            'ID': self.techniques[used],
+            'Technique': self.technique_names[used],
+            'Used By Groups': usage[used],
+            'Data Components': self.covering['detects'][used],
+            'Mitigations': self.covering['mitigates'][used],
+        })
+        table = table.sort_values(['Used By Groups', 'ID'], ascending=[False, True], kind='stable').reset_index(drop=True)
+        with self._lock:
+            self._profiles[key] = table
+            while len(self._profiles) > MAX_CACHED_PROFILES:
+                self._profiles.popitem(last=False)
+        return table
+
+    # Techniques of the profile that nothing of the given relationship type covers
+    def gaps(self, groups, mapping_type):
+        table = self.profile(groups)
+        column = 'Data Components' if mapping_type == 'detects' else 'Mitigations'
+        return table[table[column] == 0].reset_index(drop=True)
+
+    # Used, covered and uncovered technique counts of every group at once: the group
+    # matrix times the 0/1 "covered" vector of each relationship type
+    def summary(self):
+        groups = self.matrices['uses']
+        used = np.asarray(groups.sum(axis=1)).ravel().astype(int)
+        summary = pd.DataFrame({'Group': self.groups, 'Techniques Used': used})
+        for mapping_type, label in (('detects', 'Detected'), ('mitigates', 'Mitigated')):
+            covered = groups @ (self.covering[mapping_type] > 0).astype(np.float32)
+            summary[label] = covered.astype(int)
+            summary[f'Not {label}'] = used - summary[label]
+            summary[f'{label} Share'] = np.divide(summary[label], used, out=np.zeros(len(used)), where=used > 0).round(3)
+        return summary.sort_values(['Not Detected', 'Group'], ascending=[False, True], kind='stable').reset_index(drop=True)
@@ -0,0 +1,97 @@
+import pandas as pd
+
+# Stable keys of the sheets compared between releases. Data components have no ATT&CK ID,
+# their relationships fall back to the source name.
+SHEET_KEYS = {
+    'techniques': ['ID'],
+    'software': ['ID'],
+    'groups': ['ID'],
+    'campaigns': ['ID'],
+    'mitigations': ['ID'],
+    'relationships': ['source ID', 'mapping type', 'target ID'],
+}
+ID_FALLBACKS = {'source ID': 'source name', 'target ID': 'target name'}
+
+
+def _keyed(df, keys):
+    df = df.copy()
+    for key in keys:
+        if key in ID_FALLBACKS and ID_FALLBACKS[key] in df.columns:
+            df[key] = df[key].fillna(df[ID_FALLBACKS[key]])
+    return df.dropna(subset=keys).drop_duplicates(keys)
+
+
+# Added, removed and changed rows of one sheet between two releases. Rows are matched
+# with a hash join on the stable keys, and a matched row is changed when the hash of its
+# other shared columns differs.
+class SheetDiff:
+    def __init__(self, old, new, keys):
+        self.keys = keys
+        old, new = _keyed(old, keys), _keyed(new, keys)
+        compared = [column for column in old.columns if column in new.columns and column not in keys]
+
+        left = old[keys].assign(_hash=pd.util.hash_pandas_object(old[compared], index=False).to_numpy(), _old=range(len(old)))
+        right = new[keys].assign(_hash=pd.util.hash_pandas_object(new[compared], index=False).to_numpy(), _new=range(len(new)))
+        joined = left.merge(right, on=keys, how='outer', suffixes=('_old', '_new'), indicator=True)
+
+        both = joined[joined['_merge'] == 'both']
+        changed = both[both['_hash_old'] != both['_hash_new']]
+        self.added = new.iloc[joined.loc[joined['_merge'] == 'right_only', '_new'].astype(int)].reset_index(drop=True)
+        self.removed = old.iloc[joined.loc[joined['_merge'] == 'left_only', '_old'].astype(int)].reset_index(drop=True)
+        # Both versions of the changed rows, aligned on position
+        self.changed_old = old.iloc[changed['_old'].astype(int)].reset_index(drop=True)
+        self.changed_new = new.iloc[changed['_new'].astype(int)].reset_index(drop=True)
+        self.compared = compared
+
+    @property
+    def changed(self):
+        return self.changed_new
+
+    def empty(self):
+        return self.added.empty and self.removed.empty and self.changed_new.empty
+
+    # Columns whose value differs for each changed row, for display
+    def changed_columns(self):
+        old = self.changed_old[self.compared]
+        new = self.changed_new[self.compared]
+        differs = (old != new) & ~(old.isna() & new.isna())
+        names = [', '.join(column for column, flag in zip(self.compared, row) if flag) for row in differs.to_numpy()]
+        return self.changed_new[self.keys].assign(**{'changed columns': names})
+
+    # Rows that leave the sheet (removed, and the old side of changed rows) and rows that
+    # enter it, what an incremental update of derived structures needs
+    def outgoing(self):
+        return pd.concat([self.removed, self.changed_old], ignore_index=True)
+
+    def incoming(self):
+        return pd.concat([self.added, self.changed_new], ignore_index=True)
+
+    def summary(self):
+        return {'added': len(self.added), 'removed': len(self.removed), 'changed': len(self.changed_new)}
+
+
+# Differences between two loaded datasets, sheet by sheet
+class ReleaseDiff:
+    def __init__(self, old, new, sheets=None):
+        self.old = old
+        self.new = new
+        self.sheets = {}
+        for name in sheets or SHEET_KEYS:
+            if name in old.sheets and name in new.sheets:
+                self.sheets[name] = SheetDiff(old.sheets[name], new.sheets[name], SHEET_KEYS[name])
+
+    def __getitem__(self, name):
+        return self.sheets[name]
+
+    def summary(self):
+        return pd.DataFrame([dict(sheet=name, **diff.summary()) for name, diff in self.sheets.items()])
+
+    # Seed the new dataset with the aggregates of the old one patched by the changed
+    # relationships, so only the counts the release touches are recomputed
+    def carry_over(self):
+        if 'relationships' not in self.sheets or not self.old.has_derived('aggregates'):
+            return
+        relationships = self.sheets['relationships']
+        aggregates = self.old.aggregates().updated(self.new.relationship_index(),
+                                                   relationships.outgoing(), relationships.incoming())
+        self.new.seed('aggregates', aggregates)
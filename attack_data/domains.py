@@ -0,0 +1,92 @@
+import threading
+from collections.abc import Mapping
+
+import pandas as pd
+
+DEFAULT_DOMAIN = 'enterprise-attack'
+# Domain of a workbook whose techniques sheet does not name one
+UNKNOWN_DOMAIN = 'unknown'
+
+
+# Domain of a single workbook ('enterprise-attack', 'mobile-attack', 'ics-attack'), the one
+# most techniques of its techniques sheet belong to
+def dataset_domain(dataset, default=DEFAULT_DOMAIN):
+    techniques = dataset.sheets.get('techniques')
+    if techniques is None or 'domain' not in techniques.columns:
+        return default
+    domains = techniques['domain'].dropna().astype(str).str.split(',').str[0].str.strip()
+    return domains.mode().iloc[0] if len(domains) else default
+
+
+# Domains of a dataset, every member domain for a union
+def dataset_domains(dataset):
+    if isinstance(dataset.sheets, UnionSheets):
+        return list(dataset.sheets.domains)
+    return [dataset_domain(dataset)]
+
+
+# ATT&CK domain of a union member label, without the suffix telling apart two workbooks
+# of the same domain
+def base_domain(label, default=DEFAULT_DOMAIN):
+    domain = label.split(' (')[0]
+    return default if domain == UNKNOWN_DOMAIN else domain
+
+
+# Domain of every source (group or campaign) of a union, from the 'domain' its technique
+# relationships are tagged with; a source found in several domains gets the first one.
+# Empty for a single workbook, whose sources all share the workbook domain.
+def source_domains(dataset, source_type):
+    if not isinstance(dataset.sheets, UnionSheets):
+        return {}
+    sources = dataset.relationship_index().slice('uses', 'technique', source_type)
+    if 'domain' not in sources.columns:
+        return {}
+    pairs = sources[['source name', 'domain']].astype(object).drop_duplicates('source name')
+    return {name: base_domain(domain) for name, domain in zip(pairs['source name'], pairs['domain'])}
+
+
+# Sheets of several domain workbooks concatenated, each row tagged with the domain of the
+# workbook it comes from in 'domain' (the domains listed by ATT&CK move to 'domains').
+# Sheets are concatenated the first time they are read, the member sheets are not copied
+# before that.
+class UnionSheets(Mapping):
+    def __init__(self, datasets):
+        self.datasets = list(datasets)
+        self.domains = []
+        for dataset in self.datasets:
+            domain = dataset_domain(dataset, UNKNOWN_DOMAIN)
+            # Two workbooks of the same domain (e.g. two releases) stay apart
+            if domain in self.domains:
+                domain = f'{domain} ({dataset.key[:8]})'
+            self.domains.append(domain)
+        self._names = list(dict.fromkeys(name for dataset in self.datasets for name in dataset.sheets))
+        self._sheets = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        with self._lock:
+            if name not in self._sheets:
+                self._sheets[name] = self._concat(name)
+            return self._sheets[name]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def _concat(self, name):
+        frames = []
+        for dataset, domain in zip(self.datasets, self.domains):
+            if name not in dataset.sheets:
+                continue
+            frame = dataset.sheets[name]
+            if 'domain' in frame.columns:
+                frame = frame.rename(columns={'domain': 'domains'})
+                frame.insert(frame.columns.get_loc('domains'), 'domain', domain)
+            else:
+                frame = frame.assign(domain=domain)
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import plotly.io as pio
+import streamlit as st
+
+# Size of the serialized figures kept per process
+MAX_FIGURE_BYTES = int(os.environ.get("ATTACK_FIGURE_CACHE_MB", "64")) * 2**20
+# Category count above which charts group the long tail into "Other"
+MAX_CATEGORIES = int(os.environ.get("ATTACK_MAX_CATEGORIES", "30"))
+# Point count above which scatter plots are drawn with WebGL
+WEBGL_POINTS = 1000
+OTHER_LABEL = "Other"
+# Threads building the figures of a selection that are not cached yet
+FIGURE_WORKERS = min(4, os.cpu_count() or 1)
+
+_executor = ThreadPoolExecutor(max_workers=FIGURE_WORKERS, thread_name_prefix='figures')
+
+
+# Hash of (dataset version, view name, filter parameters) identifying one chart
+def figure_key(dataset_key, view, params=None):
+    payload = json.dumps([dataset_key, view, params or {}], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# Serialized Plotly figures with LRU eviction bounded by their total size in bytes
+class FigureCache:
+    def __init__(self, max_bytes=MAX_FIGURE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._figures)
+
+    def get(self, key):
+        with self._lock:
+            figure_json = self._figures.get(key)
+            if figure_json is None:
+                self.misses += 1
+                return None
+            self._figures.move_to_end(key)
+            self.hits += 1
+            return figure_json
+
+    def put(self, key, figure_json):
+        size = len(figure_json)
+        # A figure larger than the whole cache would only evict everything else
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._figures.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._figures[key] = figure_json
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._figures.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self.size = 0
+
+
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+
+# Figure of a view, built only the first time the (dataset, view, params) combination is
+# seen. Later runs rebuild it from the cached JSON, which skips the Plotly Express data
+# processing of build. Only worth it for Plotly Express figures: a graph_objects figure
+# built from ready arrays is cheaper to build again than to read back, and everything
+# build aggregates should happen inside it so a hit skips that too.
+def cached_figure(dataset_key, view, params, build):
+    cache = get_figure_cache()
+    key = figure_key(dataset_key, view, params)
+    figure_json = cache.get(key)
+    if figure_json is not None:
+        return pio.from_json(figure_json)
+    figure = build()
+    cache.put(key, figure.to_json())
+    return figure
+
+
+# Figures of several charts of one view (e.g. one per selected campaign), given as
+# (params, build) pairs. The cache is read on the script thread, the missing figures are
+# built and serialized in the figure thread pool.
+def cached_figures(dataset_key, view, jobs):
+    cache = get_figure_cache()
+    keys = [figure_key(dataset_key, view, params) for params, _ in jobs]
+    figures = [None] * len(jobs)
+    missing = []
+    for position, key in enumerate(keys):
+        figure_json = cache.get(key)
+        if figure_json is not None:
+            figures[position] = pio.from_json(figure_json)
+        else:
+            missing.append(position)
+
+    def build(position):
+        figure = jobs[position][1]()
+        return figure, figure.to_json()
+
+    built = _executor.map(build, missing) if len(missing) > 1 else map(build, missing)
+    for position, (figure, figure_json) in zip(missing, built):
+        cache.put(keys[position], figure_json)
+        figures[position] = figure
+    return figures
+
+
+# Largest max_categories - 1 categories and one "Other" row summing the rest, so the
+# number of bars or slices (and the payload) stays bounded
+def cap_categories(df, name_column, value_column, max_categories=MAX_CATEGORIES):
+    if max_categories is None or len(df) <= max_categories:
+        return df
+    ordered = df.sort_values(value_column, ascending=False, kind="stable")
+    head = ordered.iloc[:max_categories - 1]
+    tail = ordered.iloc[max_categories - 1:]
+    other = pd.DataFrame({name_column: [f"{OTHER_LABEL} ({len(tail)})"], value_column: [tail[value_column].sum()]})
+    return pd.concat([head, other], ignore_index=True)
+
+
+# Same for hierarchical charts (sunburst): at every level of the path, the children
+# outside the largest max_categories are merged into "Other"
+def cap_hierarchy(df, path, value_column, max_categories=MAX_CATEGORIES):
+    if max_categories is None or len(df) <= max_categories:
+        return df
+    capped = df[path + [value_column]].copy()
+    for depth, level in enumerate(path):
+        keys = path[:depth + 1]
+        totals = capped.groupby(keys, sort=False)[value_column].sum().sort_values(ascending=False, kind="stable")
+        if len(totals) <= max_categories:
+            continue
+        tail = totals.index[max_categories - 1:]
+        current = pd.MultiIndex.from_frame(capped[keys]) if depth else pd.Index(capped[level])
+        in_tail = current.isin(tail)
+        # Everything below an "Other" node is folded into it as well
+        capped.loc[in_tail, path[depth:]] = OTHER_LABEL
+        capped = capped.groupby(path, sort=False, as_index=False)[value_column].sum()
+    return capped
+
+
+# Same for the columns of a matrix already ordered largest first
+def cap_columns(df, max_categories=MAX_CATEGORIES):
+    if max_categories is None or df.shape[1] <= max_categories:
+        return df
+    head = df.iloc[:, :max_categories - 1]
+    tail = df.iloc[:, max_categories - 1:]
+    return head.assign(**{f"{OTHER_LABEL} ({tail.shape[1]})": tail.sum(axis=1)})
+
+
+# Checkbox to draw every category of a chart that would otherwise be capped
+def show_all_categories(key, count, max_categories=MAX_CATEGORIES):
+    if count <= max_categories:
+        return True
+    return st.checkbox(f"Show all {count} categories", key=key,
+                       help=f"Only the {max_categories - 1} largest are drawn, the rest are grouped as '{OTHER_LABEL}'")
+
+
+# Scatter plots with many points are drawn with WebGL
+def render_mode(points):
+    return "webgl" if points > WEBGL_POINTS else "auto"
@@ -0,0 +1,127 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Node types the centrality table is computed for
+CENTRALITY_TYPES = ['technique', 'group', 'software']
+# Betweenness is estimated from this many sampled sources on larger graphs, exact below it
+BETWEENNESS_SAMPLES = 128
+
+
+# ATT&CK knowledge graph of the relationships sheet. Objects are nodes keyed by their STIX
+# reference, relationships are directed edges source -> target. The adjacency is kept as
+# CSR matrices (one per mapping type) so neighbourhood questions are sparse products.
+class AttackGraph:
+    def __init__(self, df):
+        edges = df.dropna(subset=['source ref', 'target ref'])
+        refs = pd.concat([edges['source ref'], edges['target ref']], ignore_index=True)
+        codes, nodes = pd.factorize(refs)
+        self.size = len(nodes)
+        self.sources = codes[:len(edges)]
+        self.targets = codes[len(edges):]
+
+        # One row per node with the ID, name and type found on either end of an edge
+        ends = [edges[[f'{end} ref', f'{end} ID', f'{end} name', f'{end} type']].set_axis(['ref', 'ID', 'name', 'type'], axis=1)
+                for end in ('source', 'target')]
+        self.nodes = (pd.concat(ends, ignore_index=True).drop_duplicates('ref')
+                      .set_index('ref').reindex(nodes).reset_index())
+        self._positions = {}
+        for position, (node_type, name) in enumerate(zip(self.nodes['type'], self.nodes['name'])):
+            self._positions.setdefault((node_type, name), position)
+
+        self.mapping_types = edges['mapping type'].to_numpy()
+        self.adjacency = self._matrix(np.ones(len(edges), dtype=bool))
+        self._by_mapping = {mapping_type: self._matrix(self.mapping_types == mapping_type)
+                            for mapping_type in pd.unique(self.mapping_types)}
+        self._centrality = None
+
+    def _matrix(self, mask):
+        matrix = sparse.csr_matrix(
+            (np.ones(int(mask.sum()), dtype=np.float32), (self.sources[mask], self.targets[mask])),
+            shape=(self.size, self.size),
+        )
+        # Repeated relationships between the same pair count once
+        matrix.data[:] = 1
+        return matrix
+
+    def __len__(self):
+        return self.size
+
+    def edge_count(self):
+        return self.adjacency.nnz
+
+    def position(self, node_type, name):
+        return self._positions.get((node_type, name))
+
+    def names(self, node_type):
+        return sorted(self.nodes.loc[self.nodes['type'] == node_type, 'name'].dropna().unique())
+
+    def mapping(self, mapping_type):
+        matrix = self._by_mapping.get(mapping_type)
+        if matrix is None:
+            matrix = sparse.csr_matrix((self.size, self.size), dtype=np.float32)
+        return matrix
+
+    # Undirected NetworkX view of the graph, used for the centrality measures
+    def to_networkx(self):
+        undirected = ((self.adjacency + self.adjacency.T) > 0).astype(np.float32)
+        return nx.from_scipy_sparse_array(undirected)
+
+    # Degree, betweenness and PageRank of every technique, group and software node,
+    # computed once per graph
+    def centrality(self):
+        if self._centrality is None:
+            graph = self.to_networkx()
+            samples = BETWEENNESS_SAMPLES if self.size > BETWEENNESS_SAMPLES else None
+            betweenness = nx.betweenness_centrality(graph, k=samples, seed=0)
+            pagerank = nx.pagerank(graph)
+
+            undirected = nx.to_scipy_sparse_array(graph, nodelist=range(self.size))
+            table = self.nodes[['ID', 'name', 'type']].copy()
+            table['in degree'] = np.diff(self.adjacency.tocsc().indptr)
+            table['out degree'] = np.diff(self.adjacency.indptr)
+            table['degree'] = np.diff(undirected.tocsr().indptr)
+            table['betweenness'] = [betweenness.get(i, 0.0) for i in range(self.size)]
+            table['pagerank'] = [pagerank.get(i, 0.0) for i in range(self.size)]
+            self._centrality = table[table['type'].isin(CENTRALITY_TYPES)].reset_index(drop=True)
+        return self._centrality
+
+    # Nodes of one type ranked by a centrality measure
+    def top_nodes(self, node_type, metric='pagerank', k=20):
+        table = self.centrality()
+        return table[table['type'] == node_type].nlargest(k, metric).reset_index(drop=True)
+
+    # Positions of the nodes a node points at through one mapping type
+    def neighbors(self, position, mapping_type):
+        matrix = self.mapping(mapping_type)
+        return matrix.indices[matrix.indptr[position]:matrix.indptr[position + 1]]
+
+    # Techniques used by a group, campaign or software as a 0/1 vector over the nodes
+    def _technique_vector(self, name, source_type):
+        position = self.position(source_type, name)
+        vector = np.zeros(self.size, dtype=np.float32)
+        if position is not None:
+            used = self.neighbors(position, 'uses')
+            vector[used[(self.nodes['type'].to_numpy()[used] == 'technique')]] = 1
+        return vector
+
+    # Mitigations (or data components with 'detects') ranked by how many of the techniques
+    # used by one group (or campaign / software) they cover: one sparse matrix-vector product
+    def covering_sources(self, name, source_type='group', mapping_type='mitigates', k=None):
+        used = self._technique_vector(name, source_type)
+        covered = np.asarray(self.mapping(mapping_type) @ used).ravel()
+        hits = np.flatnonzero(covered)
+        order = hits[np.argsort(-covered[hits], kind='stable')]
+        if k is not None:
+            order = order[:k]
+        total = int(used.sum())
+        return pd.DataFrame({
+            'ID': self.nodes['ID'].to_numpy()[order],
+            'Name': self.nodes['name'].to_numpy()[order],
+            'Techniques Covered': covered[order].astype(int),
+            'Coverage': (covered[order] / total).round(3) if total else np.zeros(len(order)),
+        })
+
+    def mitigations_for(self, name, source_type='group', k=None):
+        return self.covering_sources(name, source_type, 'mitigates', k)
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+# Binary source x technique matrix (groups or campaigns against the techniques they use),
+# stored as CSR so comparisons between any number of rows are sparse products
+class IncidenceMatrix:
+    def __init__(self, rows, columns, column_labels, matrix):
+        self.rows = list(rows)
+        self.columns = list(columns)
+        self.column_labels = list(column_labels)
+        self.matrix = matrix.tocsr()
+        self._row_positions = {name: position for position, name in enumerate(self.rows)}
+        self.sizes = np.asarray(self.matrix.sum(axis=1)).ravel()
+
+    # Build from relationship rows, techniques are keyed by ID because several
+    # sub-techniques share a name
+    @classmethod
+    def from_relationships(cls, df, row_column='source name', column_column='target ID', label_column='target name'):
+        pairs = df[[row_column, column_column, label_column]].dropna(subset=[row_column, column_column])
+        row_codes, rows = pd.factorize(pairs[row_column], sort=True)
+        column_codes, columns = pd.factorize(pairs[column_column], sort=True)
+        names = pairs.drop_duplicates(column_column).set_index(column_column)[label_column]
+        labels = [f"{names.get(column)} ({column})" for column in columns]
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(pairs), dtype=np.float32), (row_codes, column_codes)),
+            shape=(len(rows), len(columns)),
+        )
+        # Duplicate relationships are summed on construction, the matrix only records use
+        matrix.data[:] = 1
+        return cls(rows, columns, labels, matrix)
+
+    def __contains__(self, name):
+        return name in self._row_positions
+
+    def positions(self, names):
+        return np.array([self._row_positions[name] for name in names if name in self._row_positions], dtype=np.int64)
+
+    # Dense 0/1 table of the selected rows over the techniques any of them uses
+    def used_techniques(self, names):
+        rows = self.matrix[self.positions(names)]
+        used = np.flatnonzero(np.asarray(rows.sum(axis=0)).ravel())
+        return pd.DataFrame(
+            rows[:, used].toarray().T.astype(int),
+            index=[self.column_labels[i] for i in used],
+            columns=[self.rows[i] for i in self.positions(names)],
+        )
+
+    # Number of techniques shared by each pair of the selected rows
+    def overlap(self, names):
+        positions = self.positions(names)
+        rows = self.matrix[positions]
+        labels = [self.rows[i] for i in positions]
+        return pd.DataFrame((rows @ rows.T).toarray().astype(int), index=labels, columns=labels)
+
+    # Jaccard similarity |A & B| / |A | B| between each pair of the selected rows
+    def jaccard(self, names):
+        intersection = self.overlap(names)
+        sizes = self.sizes[self.positions(names)]
+        union = sizes[:, None] + sizes[None, :] - intersection.to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = np.where(union > 0, intersection.to_numpy() / union, 0.0)
+        return pd.DataFrame(similarity, index=intersection.index, columns=intersection.columns)
+
+    # Techniques used by every one of the selected rows
+    def common_techniques(self, names):
+        positions = self.positions(names)
+        if len(positions) == 0:
+            return []
+        counts = np.asarray(self.matrix[positions].sum(axis=0)).ravel()
+        return [self.column_labels[i] for i in np.flatnonzero(counts == len(positions))]
+
+    # Top-k rows by Jaccard similarity to one row, optionally restricted to candidates
+    def most_similar(self, name, k=10, candidates=None):
+        if name not in self._row_positions:
+            return pd.DataFrame(columns=['Group', 'Shared Techniques', 'Jaccard Similarity'])
+        position = self._row_positions[name]
+        intersection = np.asarray((self.matrix @ self.matrix[position].T).todense()).ravel()
+        union = self.sizes + self.sizes[position] - intersection
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = np.where(union > 0, intersection / union, 0.0)
+
+        mask = np.ones(len(self.rows), dtype=bool)
+        if candidates is not None:
+            mask[:] = False
+            mask[self.positions(candidates)] = True
+        mask[position] = False
+        eligible = np.flatnonzero(mask)
+        k = min(k, len(eligible))
+        if k == 0:
+            return pd.DataFrame(columns=['Group', 'Shared Techniques', 'Jaccard Similarity'])
+        top = eligible[np.argpartition(-similarity[eligible], k - 1)[:k]]
+        top = top[np.argsort(-similarity[top], kind='stable')]
+        return pd.DataFrame({
+            'Group': [self.rows[i] for i in top],
+            'Shared Techniques': intersection[top].astype(int),
+            'Jaccard Similarity': similarity[top].round(3),
+        })
@@ -0,0 +1,165 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from attack_data.domains import DEFAULT_DOMAIN, dataset_domain, source_domains
+from attack_data.registry import DatasetRegistry
+from attack_data.reports import slug
+
+LAYER_VERSION = '4.5'
+NAVIGATOR_VERSION = '4.9.1'
+# Techniques used by fewer of the selected sources are lighter
+GRADIENT = ['#cfe6ff', '#0b5cad']
+DEFAULT_OUTPUT = 'layers'
+LAYER_KINDS = ['group', 'campaign']
+
+
+# Group or campaign x technique matrix the layers are read from, cached per dataset
+def source_matrix(dataset, kind):
+    return dataset.group_techniques() if kind == 'group' else dataset.campaign_techniques()
+
+
+# (technique ID, score) of every technique used by the given sources, the score being the
+# number of them that use it
+def technique_scores(matrix, names):
+    rows = matrix.matrix[matrix.positions(names)]
+    totals = np.asarray(rows.sum(axis=0)).ravel()
+    used = np.flatnonzero(totals)
+    return [(matrix.columns[i], int(totals[i])) for i in used]
+
+
+# Navigator domain of a layer of the given sources: their own domain in a union of domain
+# workbooks (the most common one for a layer mixing domains), the workbook domain otherwise
+def layer_domain(dataset, kind, names, domains=None):
+    if domains is None:
+        domains = source_domains(dataset, kind)
+    found = [domains[name] for name in names if name in domains]
+    return Counter(found).most_common(1)[0][0] if found else dataset_domain(dataset)
+
+
+def gradient_color(score, max_score):
+    share = (score - 1) / (max_score - 1) if max_score > 1 else 1.0
+    low, high = (np.array([int(color[i:i + 2], 16) for i in (1, 3, 5)]) for color in GRADIENT)
+    red, green, blue = np.round(low + (high - low) * share).astype(int)
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def layer_header(name, description, domain, max_score):
+    return {
+        'name': name,
+        'versions': {'layer': LAYER_VERSION, 'navigator': NAVIGATOR_VERSION},
+        'domain': domain,
+        'description': description,
+        'sorting': 3,
+        'hideDisabled': False,
+        'gradient': {'colors': GRADIENT, 'minValue': 1, 'maxValue': max_score},
+        'legendItems': [],
+        'showTacticRowBackground': False,
+        'selectTechniquesAcrossTactics': True,
+        'selectSubtechniquesWithParent': False,
+    }
+
+
+# Write one layer to a text stream, the technique entries one at a time so a layer is
+# never held in memory as a whole document
+def write_layer(f, name, scores, description='', domain=DEFAULT_DOMAIN):
+    max_score = max((score for _, score in scores), default=1)
+    f.write('{\n')
+    for key, value in layer_header(name, description, domain, max_score).items():
+        f.write(f'  {json.dumps(key)}: {json.dumps(value)},\n')
+    f.write('  "techniques": [')
+    for number, (technique_id, score) in enumerate(scores):
+        entry = {'techniqueID': technique_id, 'score': score, 'color': gradient_color(score, max_score),
+                 'enabled': True, 'showSubtechniques': False}
+        f.write(f'{"," if number else ""}\n    {json.dumps(entry)}')
+    f.write('\n  ]\n}\n')
+
+
+# Layer of the techniques used by the given sources, as a JSON string for downloads
+def layer_json(dataset, kind, names, name=None):
+    scores = technique_scores(source_matrix(dataset, kind), names)
+    if name is None:
+        name = names[0] if len(names) == 1 else f'{len(names)} {kind}s'
+    f = io.StringIO()
+    write_layer(f, name, scores, f'Techniques used by {", ".join(names)}', layer_domain(dataset, kind, names))
+    return f.getvalue()
+
+
+def layer_file_name(kind, name):
+    return f'{kind}_{slug(name)}.json'
+
+
+# One layer per source written into a zip archive in memory
+def layers_zip(dataset, kind, names=None):
+    matrix = source_matrix(dataset, kind)
+    names = matrix.rows if names is None else names
+    domains = source_domains(dataset, kind)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name in names:
+            with archive.open(layer_file_name(kind, name), 'w') as raw, io.TextIOWrapper(raw, encoding='utf-8') as f:
+                write_layer(f, name, technique_scores(matrix, [name]), f'Techniques used by {name}',
+                            layer_domain(dataset, kind, [name], domains))
+    return buffer.getvalue()
+
+
+# Bulk mode: one layer file per source (every group by default), written by a thread pool
+# from the shared matrix of the dataset
+def export_layers(dataset, kind='group', names=None, output=DEFAULT_OUTPUT, workers=None):
+    matrix = source_matrix(dataset, kind)
+    names = matrix.rows if names is None else names
+    domains = source_domains(dataset, kind)
+    os.makedirs(output, exist_ok=True)
+
+    def export(name):
+        path = os.path.join(output, layer_file_name(kind, name))
+        with open(path, 'w', encoding='utf-8') as f:
+            write_layer(f, name, technique_scores(matrix, [name]), f'Techniques used by {name}',
+                        layer_domain(dataset, kind, [name], domains))
+        return path
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='layers') as executor:
+        return list(executor.map(export, names))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write ATT&CK Navigator layers of the techniques used by groups or campaigns.")
+    parser.add_argument('workbook', help="ATT&CK workbook or STIX bundle to load")
+    parser.add_argument('--kind', choices=LAYER_KINDS, default='group', help="Sources to write layers for")
+    parser.add_argument('--names', nargs='+', help="Groups or campaigns to export, all of them by default")
+    parser.add_argument('--combined', help="Write a single layer with this name scoring how many of the sources use each technique")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Directory to write the layers to")
+    parser.add_argument('--workers', type=int, help="Writer threads")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    registry = DatasetRegistry()
+    dataset = registry.get(registry.load(args.workbook))
+    names = args.names or source_matrix(dataset, args.kind).rows
+    unknown = [name for name in names if name not in source_matrix(dataset, args.kind)]
+    for name in unknown:
+        print(f"Unknown {args.kind} skipped: {name}", file=sys.stderr)
+    names = [name for name in names if name not in unknown]
+
+    if args.combined:
+        os.makedirs(args.output, exist_ok=True)
+        path = os.path.join(args.output, f'{slug(args.combined)}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(layer_json(dataset, args.kind, names, args.combined))
+        paths = [path]
+    else:
+        paths = export_layers(dataset, args.kind, names, args.output, args.workers)
+    print(f"{len(paths)} layers written to {args.output} in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
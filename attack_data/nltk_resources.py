@@ -0,0 +1,46 @@
+import functools
+import logging
+import os
+import re
+
+import nltk
+
+logger = logging.getLogger(__name__)
+
+# Extra local NLTK data directory, e.g. one baked into the deployment image
+NLTK_DATA_DIR = os.environ.get("ATTACK_NLTK_DATA")
+
+# Words, dotted/hyphenated identifiers such as T1059.001, or single punctuation marks
+_TOKEN_PATTERN = re.compile(r"\w+(?:[.\-']\w+)*|[^\w\s]")
+
+
+def regex_tokenize(text):
+    return _TOKEN_PATTERN.findall(text)
+
+
+# Resolve the NLTK resources once per process from local data only, never from the network.
+# Returns (stop words, tokenizer), falling back to scikit-learn's stop words and a regex
+# tokenizer when the corpora are not installed.
+@functools.lru_cache(maxsize=None)
+def nltk_resources():
+    if NLTK_DATA_DIR and NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+    try:
+        from nltk.corpus import stopwords
+        stop_words = frozenset(stopwords.words('english'))
+    except LookupError:
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+        logger.warning("NLTK stopwords not found locally, using scikit-learn's English stop words")
+        stop_words = frozenset(ENGLISH_STOP_WORDS)
+
+    try:
+        from nltk.tokenize import word_tokenize
+        # punkt (or punkt_tab on newer NLTK) is only loaded on first use
+        word_tokenize("probe")
+        tokenize = word_tokenize
+    except LookupError:
+        logger.warning("NLTK punkt tokenizer not found locally, using the regex tokenizer")
+        tokenize = regex_tokenize
+
+    return stop_words, tokenize
@@ -0,0 +1,148 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# pyarrow is optional, pages are handed to st.dataframe as DataFrames without it
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+PAGE_SIZES = [25, 50, 100, 250]
+# Pages and search results kept per source
+MAX_CACHED_PAGES = 64
+# Text columns longer than this on average are hidden until selected
+LONG_TEXT_LENGTH = 100
+
+
+# Server-side rows of one sheet or slice for the paged preview. Sort orders and search
+# results are computed once per column / query, and each page is converted to Arrow
+# once, so a rerun only sends the visible page.
+class PreviewSource:
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.columns = [str(column) for column in self.df.columns]
+        self._orders = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        text = self.df.select_dtypes(include=['object', 'string', 'category'])
+        lengths = {column: text[column].dropna().astype(str).str.len().mean() for column in text.columns}
+        self.text_columns = list(text.columns)
+        self.long_columns = [column for column, length in lengths.items() if length and length > LONG_TEXT_LENGTH]
+
+    def __len__(self):
+        return len(self.df)
+
+    def default_columns(self):
+        return [column for column in self.df.columns if column not in self.long_columns]
+
+    def _cached(self, key, build):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        value = build()
+        with self._lock:
+            self._cache[key] = value
+            while len(self._cache) > MAX_CACHED_PAGES:
+                self._cache.popitem(last=False)
+        return value
+
+    # Row positions in sorted order, missing values last in both directions
+    def order(self, column, ascending=True):
+        key = (column, ascending)
+        with self._lock:
+            order = self._orders.get(key)
+        if order is None:
+            values = self.df[column]
+            order = values.sort_values(ascending=ascending, na_position='last', kind='stable').index.to_numpy()
+            with self._lock:
+                order = self._orders.setdefault(key, order)
+        return order
+
+    # Rows of one column containing the query. Categorical columns are matched on their
+    # categories only, then mapped back to the rows through the codes.
+    def _contains(self, column, query):
+        values = self.df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            matches = values.cat.categories.astype(str).str.contains(query, case=False, regex=False)
+            # Code -1 (missing) picks the trailing False
+            return np.append(np.asarray(matches, dtype=bool), False)[values.cat.codes.to_numpy()]
+        return values.str.contains(query, case=False, regex=False, na=False).to_numpy()
+
+    # Rows where any text column contains the query (case-insensitive)
+    def search(self, query):
+        def build():
+            mask = np.zeros(len(self.df), dtype=bool)
+            for column in self.text_columns:
+                mask |= self._contains(column, query)
+            return mask
+        return self._cached(('search', query), build)
+
+    # Positions of the rows to show: the optional row subset (e.g. the sidebar filters),
+    # narrowed by the search and ordered by the sort column
+    def positions(self, rows=None, rows_key=None, sort=None, ascending=True, query=''):
+        def build():
+            mask = np.ones(len(self.df), dtype=bool)
+            if rows is not None:
+                mask = np.zeros(len(self.df), dtype=bool)
+                mask[rows] = True
+            if query:
+                mask &= self.search(query)
+            if sort is None:
+                return np.flatnonzero(mask)
+            order = self.order(sort, ascending)
+            return order[mask[order]]
+        return self._cached(('positions', rows_key if rows is not None else None, sort, ascending, query), build)
+
+    # One page of the selected columns, as an Arrow table when pyarrow is available
+    def page(self, positions, number, size, columns, positions_key=None):
+        def build():
+            frame = self.df.iloc[positions[number * size:(number + 1) * size]][columns]
+            if pa is None:
+                return frame
+            try:
+                return pa.Table.from_pandas(frame, preserve_index=False)
+            except (pa.ArrowException, TypeError, ValueError):
+                return frame.astype(str)
+        return self._cached(('page', positions_key, number, size, tuple(columns)), build)
+
+
+# Paged preview with column selection, search and sort, only the visible page is sent
+# to the browser. rows restricts the source to some positions, rows_key identifies them.
+def paged_dataframe(source, key, rows=None, rows_key=None):
+    col1, col2, col3 = st.columns([3, 2, 1])
+    with col1:
+        columns = st.multiselect("Columns", source.columns, default=source.default_columns(), key=f"{key}_columns")
+    with col2:
+        query = st.text_input("Search", "", key=f"{key}_search")
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_size")
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        sort = st.selectbox("Sort by", [None] + source.columns, format_func=lambda column: column or "(sheet order)",
+                            key=f"{key}_sort")
+    with col2:
+        ascending = st.toggle("Ascending", value=True, key=f"{key}_ascending")
+
+    positions = source.positions(rows, rows_key, sort, ascending, query)
+    pages = max(1, math.ceil(len(positions) / page_size))
+    # Keep the page number valid when a new search or filter shrinks the result
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = 1
+    number = st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+
+    if not columns:
+        st.info("Select at least one column to preview.")
+        return
+    positions_key = (rows_key if rows is not None else None, sort, ascending, query)
+    st.dataframe(source.page(positions, int(number) - 1, page_size, columns, positions_key), hide_index=True)
+    first = (int(number) - 1) * page_size
+    st.caption(f"Rows {min(first + 1, len(positions))}-{min(first + page_size, len(positions))} of {len(positions)}"
+               f" ({len(source)} in total)")
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# File the process-wide stage metrics are written to after every run, JSON when the name
+# ends in .json, Prometheus text format otherwise. Unset to keep the metrics in memory only.
+METRICS_FILE = os.environ.get("ATTACK_METRICS_FILE")
+
+
+# Wall time of the named stages of one script run. Nested stages are recorded under
+# their path ("tfidf/figure"), a stage entered several times accumulates.
+class RunProfile:
+    def __init__(self, page):
+        self.page = page
+        self.stages = {}
+        self._stack = []
+        self._open = []
+        self._start = time.perf_counter()
+        self.total = None
+
+    @contextmanager
+    def stage(self, name):
+        self._stack.append(name)
+        path = "/".join(self._stack)
+        start = time.perf_counter()
+        self._open.append((path, start))
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            self._open.pop()
+            # Stages still open when the run finished were counted by finish()
+            if self.total is None:
+                self._add(path, time.perf_counter() - start)
+
+    def _add(self, path, seconds):
+        entry = self.stages.setdefault(path, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    # A run that ends early (st.stop() or st.rerun() inside a stage) counts its open
+    # stages up to now
+    def finish(self):
+        now = time.perf_counter()
+        for path, start in self._open:
+            self._add(path, now - start)
+        self.total = now - self._start
+
+    def frame(self):
+        total = self.total or time.perf_counter() - self._start
+        rows = [{"stage": path, "ms": seconds * 1000, "calls": calls, "share": seconds / total if total else 0.0}
+                for path, (seconds, calls) in self.stages.items()]
+        rows.append({"stage": "run", "ms": total * 1000, "calls": 1, "share": 1.0})
+        return pd.DataFrame(rows).round({"ms": 1, "share": 3})
+
+
+# Counters of every stage of every page since the process started, for scraping
+class StageMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, profile):
+        timings = {path: seconds for path, (seconds, _) in profile.stages.items()}
+        timings["run"] = profile.total
+        with self._lock:
+            for path, seconds in timings.items():
+                entry = self._stages.setdefault((profile.page, path), {"count": 0, "sum": 0.0, "max": 0.0, "last": 0.0})
+                entry["count"] += 1
+                entry["sum"] += seconds
+                entry["max"] = max(entry["max"], seconds)
+                entry["last"] = seconds
+
+    def to_json(self):
+        with self._lock:
+            return [dict(page=page, stage=path, **entry) for (page, path), entry in sorted(self._stages.items())]
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP attack_stage_seconds Wall time of the named stages of a page run.",
+            "# TYPE attack_stage_seconds summary",
+        ]
+        for entry in self.to_json():
+            labels = f'page="{entry["page"]}",stage="{entry["stage"]}"'
+            lines.append(f"attack_stage_seconds_sum{{{labels}}} {entry['sum']:.6f}")
+            lines.append(f"attack_stage_seconds_count{{{labels}}} {entry['count']}")
+        lines.append("# HELP attack_stage_seconds_max Slowest run of the named stages of a page.")
+        lines.append("# TYPE attack_stage_seconds_max gauge")
+        for entry in self.to_json():
+            lines.append(f'attack_stage_seconds_max{{page="{entry["page"]}",stage="{entry["stage"]}"}} {entry["max"]:.6f}')
+        return "\n".join(lines) + "\n"
+
+    # Replace the metrics file atomically so a scraper never reads half of it
+    def write(self, path):
+        content = json.dumps(self.to_json(), indent=2) if path.endswith(".json") else self.to_prometheus()
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+@st.cache_resource
+def get_metrics():
+    return StageMetrics()
+
+
+# Start timing a run of a page, stages are attributed to it until finish_run
+def start_run(page):
+    profile = RunProfile(page)
+    st.session_state["run_profile"] = profile
+    return profile
+
+
+# Time a block of the current run, a no-op outside of a profiled run
+def stage(name):
+    profile = st.session_state.get("run_profile")
+    if profile is None:
+        return nullcontext()
+    return profile.stage(name)
+
+
+# Record the run in the process metrics and show the optional sidebar panel. Pages call
+# it before st.stop() and st.rerun() as well: once those raise, Streamlit can no longer be
+# used to record the run.
+def finish_run():
+    profile = st.session_state.pop("run_profile", None)
+    if profile is None:
+        return
+    profile.finish()
+    metrics = get_metrics()
+    metrics.record(profile)
+    if METRICS_FILE:
+        try:
+            metrics.write(METRICS_FILE)
+        except OSError as error:
+            logger.warning("Could not write metrics to %s: %s", METRICS_FILE, error)
+
+    with st.sidebar:
+        if st.checkbox("Show profiling panel", key="show_profiling"):
+            st.caption(f"Stages of the last {profile.page} run")
+            st.dataframe(profile.frame(), hide_index=True)
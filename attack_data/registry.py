@@ -0,0 +1,252 @@
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from attack_data.aggregates import AggregateCube
+from attack_data.cache import content_hash, file_bytes, read_manifest
+from attack_data.campaigns import CampaignAnalytics
+from attack_data.coverage import CoverageMatrix
+from attack_data.graph import AttackGraph
+from attack_data.incidence import IncidenceMatrix
+from attack_data.relationships import RelationshipIndex
+from attack_data.search import load_search_index
+from attack_data.timeline import CampaignTimeline
+from attack_data.tokens import TokenIndex
+from attack_data.workbook import convert_workbooks, open_sheets
+
+# Number of distinct workbooks kept in memory at once
+MAX_DATASETS = 4
+
+_MISSING = object()
+
+
+# One loaded workbook, shared read-only by every session that uploaded the same content.
+# sheets maps sheet name -> DataFrame, for workbooks a sheet is parsed the first time it is read.
+class Dataset:
+    def __init__(self, key, sheets):
+        self.key = key
+        self.sheets = sheets
+        self._derived = {}
+        self._building = {}
+        self._lock = threading.Lock()
+
+    # Structures derived from the sheets are built on first use and shared like the sheets.
+    # Built ones are read without locking; a build only holds the lock of its own name, so
+    # a slow one (search index, graph centrality) does not hold up the other structures.
+    def derived(self, name, build):
+        value = self._derived.get(name, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            name_lock = self._building.setdefault(name, threading.Lock())
+        with name_lock:
+            value = self._derived.get(name, _MISSING)
+            if value is not _MISSING:
+                return value
+            try:
+                value = build(self)
+                with self._lock:
+                    return self._derived.setdefault(name, value)
+            finally:
+                with self._lock:
+                    self._building.pop(name, None)
+
+    def has_derived(self, name):
+        return name in self._derived
+
+    # Install a structure built elsewhere, e.g. carried over from a previous release
+    def seed(self, name, value):
+        with self._lock:
+            self._derived.setdefault(name, value)
+
+    def relationship_index(self):
+        return self.derived('relationship_index', lambda dataset: RelationshipIndex(dataset.sheets['relationships']))
+
+    def aggregates(self):
+        return self.derived('aggregates', lambda dataset: AggregateCube(dataset.relationship_index()))
+
+    # Detection and mitigation coverage of the techniques used by the groups
+    def coverage(self):
+        return self.derived('coverage', lambda dataset: CoverageMatrix(dataset.relationship_index()))
+
+    def graph(self):
+        return self.derived('graph', lambda dataset: AttackGraph(dataset.sheets['relationships']))
+
+    def group_techniques(self):
+        return self.derived('group_techniques', lambda dataset: IncidenceMatrix.from_relationships(
+            dataset.relationship_index().slice('uses', 'technique', 'group')))
+
+    def campaign_techniques(self):
+        return self.derived('campaign_techniques', lambda dataset: IncidenceMatrix.from_relationships(
+            dataset.relationship_index().slice('uses', 'technique', 'campaign')))
+
+    # Technique and tactic counts of every campaign
+    def campaign_analytics(self):
+        return self.derived('campaign_analytics', lambda dataset: CampaignAnalytics(
+            dataset.relationship_index().slice('uses', 'technique', 'campaign'), dataset.sheets['techniques']))
+
+    # Campaign dates parsed once, with the groups the campaigns are attributed to
+    def campaign_timeline(self):
+        def build(dataset):
+            attributions = dataset.relationship_index().slice('attributed-to', 'group', 'campaign')
+            attributions = attributions[['source name', 'target name']].set_axis(['campaign', 'group'], axis=1)
+            return CampaignTimeline(dataset.sheets['campaigns'], attributions)
+        return self.derived('campaign_timeline', build)
+
+    # Full-text index of the names and descriptions, persisted next to the columnar store
+    def search_index(self):
+        return self.derived('search_index', load_search_index)
+
+    # Membership matrix of a comma separated column such as 'platforms' or 'tactics'
+    def token_index(self, sheet, column):
+        return self.derived(f'tokens:{sheet}:{column}', lambda dataset: TokenIndex(dataset.sheets[sheet][column]))
+
+    # TF-IDF model of a text column, imported lazily so the other views do not pay for NLTK
+    def corpus_model(self, sheet, column):
+        from attack_data.text import CorpusModel
+        return self.derived(f'corpus:{sheet}:{column}', lambda dataset: CorpusModel(dataset.sheets[sheet][column]))
+
+    # Server-side rows of the paged preview of a sheet or slice, imported lazily because
+    # it depends on Streamlit
+    def preview_source(self, name, frame):
+        from attack_data.preview import PreviewSource
+        return self.derived(f'preview:{name}', lambda dataset: PreviewSource(frame))
+
+    def sheet(self, name):
+        return self.sheets.get(name)
+
+    def sheet_names(self):
+        return list(self.sheets.keys())
+
+
+# Process-wide map of content hash -> Dataset with reference counts and LRU eviction.
+# Sessions only keep the key, so memory grows with the number of distinct workbooks.
+class DatasetRegistry:
+    def __init__(self, max_datasets=MAX_DATASETS):
+        self.max_datasets = max_datasets
+        self._lock = threading.RLock()
+        self._datasets = OrderedDict()
+        self._refcounts = {}
+        self._loading = {}
+
+    # Load a file (or reuse the copy already in memory) and return its key. With acquire the
+    # caller's reference is taken before anything is evicted, so the new dataset is never
+    # the one dropped to make room for itself.
+    def load(self, file, acquire=False):
+        return self.load_dataset(file, acquire).key
+
+    def load_dataset(self, file, acquire=False):
+        data = file_bytes(file)
+        return self._load_data(data, content_hash(data), acquire)
+
+    def _load_data(self, data, key, acquire=False):
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Only one session parses a given workbook, the others wait for it
+        if dataset is None:
+            with key_lock:
+                with self._lock:
+                    dataset = self._datasets.get(key)
+                if dataset is None:
+                    try:
+                        # Workbook sheet names are available right away, the sheets parse in the background
+                        return self._register(Dataset(key, open_sheets(data, key)), acquire)
+                    finally:
+                        with self._lock:
+                            self._loading.pop(key, None)
+        return self._register(dataset, acquire)
+
+    # Load several workbooks (e.g. the Enterprise, Mobile and ICS releases) concurrently,
+    # each one cached like a single upload. The ones never converted before are parsed in
+    # parallel worker processes that fill the columnar store, then every workbook is opened
+    # from the store. The datasets themselves are returned, so they stay usable even if the
+    # registry evicts one of them meanwhile.
+    def load_all(self, files, workers=None):
+        contents = [file_bytes(file) for file in files]
+        keys = [content_hash(data) for data in contents]
+        with self._lock:
+            cold = {key: data for data, key in zip(contents, keys)
+                    if key not in self._datasets and read_manifest(key) is None}
+        if len(cold) > 1:
+            convert_workbooks([(data, key) for key, data in cold.items()], workers)
+        with ThreadPoolExecutor(max_workers=len(files) or 1, thread_name_prefix='domains') as executor:
+            return list(executor.map(self._load_data, contents, keys))
+
+    # Dataset whose sheets are the union of the sheets of the given datasets, tagged by
+    # domain, so the views and filters work across domains without reloading anything
+    def union(self, datasets, acquire=False):
+        from attack_data.domains import UnionSheets
+        members = list({dataset.key: dataset for dataset in datasets}.values())
+        if len(members) == 1:
+            return self._register(members[0], acquire)
+        key = 'union-' + content_hash('|'.join(sorted(member.key for member in members)).encode('utf-8'))
+        dataset = self.get(key)
+        if dataset is None:
+            dataset = Dataset(key, UnionSheets(members))
+        return self._register(dataset, acquire)
+
+    # Add a dataset, or reuse the one registered under its key, as the most recently used
+    def _register(self, dataset, acquire=False):
+        with self._lock:
+            dataset = self._datasets.setdefault(dataset.key, dataset)
+            self._datasets.move_to_end(dataset.key)
+            if acquire:
+                self._refcounts[dataset.key] = self._refcounts.get(dataset.key, 0) + 1
+            self._evict(keep=dataset.key)
+            return dataset
+
+    def get(self, key):
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is not None:
+                self._datasets.move_to_end(key)
+            return dataset
+
+    def acquire(self, key):
+        with self._lock:
+            self._refcounts[key] = self._refcounts.get(key, 0) + 1
+
+    def release(self, key):
+        with self._lock:
+            count = self._refcounts.get(key, 0) - 1
+            if count > 0:
+                self._refcounts[key] = count
+            else:
+                self._refcounts.pop(key, None)
+            self._evict()
+
+    def refcount(self, key):
+        with self._lock:
+            return self._refcounts.get(key, 0)
+
+    def keys(self):
+        with self._lock:
+            return list(self._datasets.keys())
+
+    # Drop least recently used datasets over the limit, unreferenced ones first.
+    # Referenced datasets can still go when every slot is in use (e.g. sessions that
+    # were closed without releasing), their sessions reload them from the upload.
+    def _evict(self, keep=None):
+        while len(self._datasets) > self.max_datasets:
+            candidates = [key for key in self._datasets if key != keep]
+            if not candidates:
+                return
+            victim = next((key for key in candidates if not self._refcounts.get(key)), candidates[0])
+            del self._datasets[victim]
+
+
+# Reference a session holds on a dataset. It is released by the session (a new upload,
+# "Remove Uploaded File") or, for sessions closed with the browser, when the session state
+# holding it is garbage collected.
+class DatasetLease:
+    def __init__(self, registry, key):
+        self.key = key
+        # The reference was taken by the registry when the dataset was loaded
+        self._release = weakref.finalize(self, registry.release, key)
+
+    def release(self):
+        self._release()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+# Columns the relationships sheet is sliced by, in sort order.
+# Target type comes before source type so that the (mapping type, target type) slices
+# used by the pages, which mix several source types, are one contiguous block.
+KEY_COLUMNS = ['mapping type', 'target type', 'source type']
+
+
+# Relationships sheet sorted by its key columns with offset tables, so any
+# (mapping type, target type, source type) slice is a positional view instead of a boolean scan
+class RelationshipIndex:
+    def __init__(self, df):
+        self.categories = {}
+        codes = []
+        for column in KEY_COLUMNS:
+            encoded = pd.Categorical(df[column])
+            self.categories[column] = list(encoded.categories)
+            codes.append(np.asarray(encoded.codes, dtype=np.int16))
+
+        # np.lexsort sorts by the last key first and is stable, so rows keep the sheet order
+        # inside each slice
+        order = np.lexsort(codes[::-1])
+        self.frame = df.take(order)
+        self.codes = {column: code[order] for column, code in zip(KEY_COLUMNS, codes)}
+
+        # Offset tables for every prefix of the sort key
+        self._offsets = {}
+        if len(df):
+            keys = np.column_stack([self.codes[column] for column in KEY_COLUMNS])
+            for depth in range(1, len(KEY_COLUMNS) + 1):
+                prefix = keys[:, :depth]
+                changes = np.flatnonzero((prefix[1:] != prefix[:-1]).any(axis=1)) + 1
+                starts = np.concatenate(([0], changes))
+                stops = np.concatenate((changes, [len(prefix)]))
+                for start, stop in zip(starts, stops):
+                    # Missing values have code -1 and are keyed as None
+                    key = tuple(self.categories[column][code] if code >= 0 else None
+                                for column, code in zip(KEY_COLUMNS, prefix[start]))
+                    self._offsets[key] = (int(start), int(stop))
+
+    def __len__(self):
+        return len(self.frame)
+
+    def values(self, column):
+        return self.categories[column]
+
+    def _ranges(self, mapping_type, target_type, source_type):
+        wanted = (mapping_type, target_type, source_type)
+        # Keys given as a prefix of the sort order map to a single block
+        depth = 0
+        while depth < len(wanted) and wanted[depth] is not None:
+            depth += 1
+        if all(value is None for value in wanted[depth:]):
+            if depth == 0:
+                return [(0, len(self.frame))]
+            block = self._offsets.get(wanted[:depth])
+            return [block] if block else []
+
+        # Otherwise gather the blocks of every matching full key
+        ranges = []
+        for key, block in self._offsets.items():
+            if len(key) == len(KEY_COLUMNS) and all(w is None or w == k for w, k in zip(wanted, key)):
+                ranges.append(block)
+        return sorted(ranges)
+
+    # Rows of the relationships sheet matching the given types, None matches any value
+    def slice(self, mapping_type=None, target_type=None, source_type=None):
+        ranges = self._ranges(mapping_type, target_type, source_type)
+        if not ranges:
+            return self.frame.iloc[0:0]
+        if len(ranges) == 1:
+            start, stop = ranges[0]
+            return self.frame.iloc[start:stop]
+        positions = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+        return self.frame.iloc[positions]
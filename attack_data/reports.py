@@ -0,0 +1,212 @@
+import argparse
+import html
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from attack_data import trends
+from attack_data.registry import DatasetRegistry
+
+# kaleido is optional, the PNG images are skipped without it
+try:
+    import kaleido
+except ImportError:
+    kaleido = None
+
+REPORT_FORMATS = ['csv', 'html', 'png']
+DEFAULT_FORMATS = ['csv', 'html']
+DEFAULT_OUTPUT = 'reports'
+# Same thresholds as the defaults of the Trends page sliders
+TECHNIQUES_MIN_COUNT = 100
+SOFTWARE_MIN_COUNT = 10
+
+# Dataset and settings of a worker process, set once by init_worker
+_worker = {}
+
+
+# Views of the Trends page that do not depend on a selection, as (name, table, figure)
+def overview_views(dataset):
+    technique_counts = trends.technique_counts(dataset, TECHNIQUES_MIN_COUNT)
+    yield 'techniques', technique_counts, trends.techniques_figure(technique_counts, TECHNIQUES_MIN_COUNT)
+
+    software_counts = trends.software_counts(dataset, SOFTWARE_MIN_COUNT)
+    yield 'software', software_counts, trends.software_figure(software_counts, SOFTWARE_MIN_COUNT)
+    platform_usage = trends.software_platform_usage(dataset, software_counts)
+    yield 'software_platforms', platform_usage, trends.platform_usage_figure(platform_usage)
+
+    for name, relationship_type, source_name, source_type, mapping_type, chart_title, label in [
+            ('detection', 'detects', 'Data Components', 'Data Components', 'Detect', 'Detection', 'Detected'),
+            ('mitigation', 'mitigates', 'Mitigation Methods', 'Mitigation Methods', 'Mitigate', 'Mitigation', 'Mitigated')]:
+        source_counts = trends.source_counts(dataset, relationship_type, source_name, chart_title)
+        yield name, source_counts, trends.source_figure(source_counts, source_name, source_type, mapping_type, chart_title)
+        bubbles = trends.bubble_table(dataset, relationship_type, source_counts, source_name)
+        yield f'{name}_bubbles', bubbles, trends.bubble_figure(bubbles, source_name, source_type, chart_title)
+        coverage = trends.coverage_table(dataset, label)
+        yield f'{name}_coverage', coverage, trends.coverage_figure(coverage, label)
+
+    group_counts = trends.campaign_group_counts(dataset)
+    yield 'campaign_groups', group_counts, trends.campaign_group_figure(group_counts)
+    campaign_counts = trends.campaigns_per_year(dataset)
+    yield 'campaigns_per_year', campaign_counts, trends.campaigns_per_year_figure(campaign_counts)
+    yield 'campaigns_by_year', trends.campaigns_by_year(dataset), None
+    campaign_data = trends.campaign_durations(dataset)
+    yield 'campaign_durations', campaign_data, trends.campaign_scatter_figure(campaign_data)
+
+    timeline = dataset.campaign_timeline()
+    if timeline.start() is not None:
+        active = timeline.active(timeline.start(), timeline.end())
+        yield 'campaign_timeline', active, trends.campaign_gantt_figure(active)
+        activity = timeline.monthly_activity()
+        yield 'campaign_activity', activity, trends.monthly_activity_figure(activity)
+    yield 'overlapping_campaigns', timeline.overlapping(), None
+
+
+def campaign_views(dataset, campaign):
+    technique_counts = trends.campaign_technique_counts(dataset, campaign)
+    yield 'techniques', technique_counts, trends.campaign_techniques_figure(technique_counts, campaign)
+    tactic_counts = trends.campaign_tactic_counts(dataset, campaign)
+    yield 'tactics', tactic_counts, trends.campaign_tactics_figure(tactic_counts, campaign)
+
+
+def group_views(dataset, group):
+    techniques = trends.group_technique_table(dataset, group)
+    yield 'techniques', techniques, None
+    tactic_counts = trends.group_tactic_counts(techniques)
+    yield 'tactics', tactic_counts, trends.group_tactics_figure(tactic_counts, group)
+    yield 'overlapping_campaigns', dataset.campaign_timeline().overlapping(group), None
+    # Techniques of the group with the data components and mitigations covering them
+    yield 'coverage', dataset.coverage().profile([group]), None
+
+
+VIEWS = {
+    'overview': lambda dataset, subject: overview_views(dataset),
+    'campaign': campaign_views,
+    'group': group_views,
+}
+
+
+# File name part of a campaign or group name
+def slug(name):
+    return re.sub(r'[^A-Za-z0-9]+', '_', str(name)).strip('_') or 'unnamed'
+
+
+# Write the table and figure of one view in the requested formats, empty views are skipped
+def write_view(directory, name, table, figure, formats):
+    written = []
+    if table is None or table.empty:
+        return written
+    base = os.path.join(directory, name)
+    if 'csv' in formats:
+        table.to_csv(f'{base}.csv', index=False)
+        written.append(f'{base}.csv')
+    if figure is not None:
+        if 'html' in formats:
+            # The figures share the plotly.js bundle from the CDN instead of embedding 3 MB each
+            figure.write_html(f'{base}.html', include_plotlyjs='cdn')
+            written.append(f'{base}.html')
+        if 'png' in formats and kaleido is not None:
+            figure.write_image(f'{base}.png')
+            written.append(f'{base}.png')
+    return written
+
+
+# Load the dataset once per worker, from the columnar cache the parent process filled
+def init_worker(workbook, output, formats):
+    registry = DatasetRegistry()
+    _worker['dataset'] = registry.get(registry.load(workbook))
+    _worker['output'] = output
+    _worker['formats'] = formats
+
+
+# Render every view of one (kind, subject) report into its own directory
+def render_task(kind, subject):
+    directory = _worker['output'] if kind == 'overview' else os.path.join(_worker['output'], f'{kind}s', slug(subject))
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for name, table, figure in VIEWS[kind](_worker['dataset'], subject):
+        written.extend(write_view(directory, name, table, figure, _worker['formats']))
+    return kind, subject, written
+
+
+# Names from the command line, 'all' meaning every known name
+def select_subjects(requested, known, kind):
+    if not requested:
+        return []
+    if requested == ['all']:
+        return list(known)
+    known = set(known)
+    for name in requested:
+        if name not in known:
+            print(f"Unknown {kind} skipped: {name}", file=sys.stderr)
+    return [name for name in requested if name in known]
+
+
+# Index page linking the HTML reports
+def write_index(output, results):
+    lines = ['<html><head><meta charset="utf-8"><title>MITRE ATT&amp;CK Reports</title></head><body>',
+             '<h1>MITRE ATT&amp;CK Reports</h1>']
+    for kind, subject, written in sorted(results, key=lambda result: (result[0] != 'overview', result[0], str(result[1]))):
+        title = 'Overview' if kind == 'overview' else f'{kind.title()}: {subject}'
+        links = [f'<a href="{html.escape(os.path.relpath(path, output))}">{html.escape(os.path.basename(path))}</a>'
+                 for path in written]
+        lines.append(f'<h2>{html.escape(title)}</h2><p>{" | ".join(links) or "No data"}</p>')
+    lines.append('</body></html>')
+    path = os.path.join(output, 'index.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+    return path
+
+
+def generate(workbook, campaigns=None, groups=None, output=DEFAULT_OUTPUT, formats=DEFAULT_FORMATS, workers=None):
+    start = time.perf_counter()
+    formats = list(formats)
+    if 'png' in formats and kaleido is None:
+        print("kaleido is not installed, PNG images are skipped (pip install kaleido)", file=sys.stderr)
+
+    # Loading here parses the workbook once and fills the cache the workers read from
+    init_worker(workbook, output, formats)
+    dataset = _worker['dataset']
+    tasks = [('overview', None)]
+    tasks += [('campaign', name) for name in select_subjects(campaigns, trends.campaign_names(dataset), 'campaign')]
+    tasks += [('group', name) for name in select_subjects(groups, trends.group_names(dataset), 'group')]
+    os.makedirs(output, exist_ok=True)
+
+    results = []
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        results = [render_task(kind, subject) for kind, subject in tasks]
+    else:
+        # spawn: the workbook reader's thread pool does not survive a fork
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                                 initargs=(workbook, output, formats)) as executor:
+            futures = [executor.submit(render_task, kind, subject) for kind, subject in tasks]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+    index = write_index(output, results)
+    files = sum(len(written) for _, _, written in results)
+    print(f"{files} files for {len(tasks)} reports written to {output} in {time.perf_counter() - start:.1f} s ({index})")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the Trends views as CSV tables and HTML/PNG charts without a browser.")
+    parser.add_argument('workbook', help="ATT&CK workbook or STIX bundle to load")
+    parser.add_argument('--campaigns', nargs='+', help="Campaigns to report on, or 'all'")
+    parser.add_argument('--groups', nargs='+', help="Groups to report on, or 'all'")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Directory to write the reports to")
+    parser.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=DEFAULT_FORMATS,
+                        help="Files to write for every view (png needs kaleido)")
+    parser.add_argument('--workers', type=int, help="Worker processes, one per CPU by default")
+    args = parser.parse_args(argv)
+
+    generate(args.workbook, args.campaigns, args.groups, args.output, args.formats, args.workers)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from attack_data import cache
+
+logger = logging.getLogger(__name__)
+
+# Sheets searched, in the order results with equal scores are listed
+SEARCH_SHEETS = ['techniques', 'software', 'groups', 'campaigns', 'mitigations']
+# A word of the name counts as this many words of the description (BM25F field weight)
+NAME_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Completions of the last, unfinished word of a query
+MAX_PREFIX_TERMS = 64
+SNIPPET_LENGTH = 160
+INDEX_FILE = 'search_index.npz'
+INDEX_VERSION = 1
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+# ATT&CK IDs: techniques and sub-techniques, software, groups, campaigns, mitigations
+ID_PATTERN = re.compile(r'^(T\d{4}(\.\d{3})?|S\d{4}|G\d{4}|C\d{4}|M\d{4})$', re.IGNORECASE)
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+# Inverted index of the names and descriptions of the searched sheets. The BM25 weight of
+# every (document, term) pair is computed when the index is built, so a query only sums
+# the columns of its terms. Terms are kept sorted, a prefix is a range of the vocabulary.
+class SearchIndex:
+    def __init__(self, terms, weights, sheets, ids, names, snippets):
+        self.terms = terms
+        self.weights = weights.tocsc()
+        self.sheets = sheets
+        self.ids = ids
+        self.names = names
+        self.snippets = snippets
+        self._id_positions = {}
+        for position, object_id in enumerate(ids):
+            self._id_positions.setdefault(object_id.upper(), []).append(position)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, sheets):
+        documents = []
+        for sheet in SEARCH_SHEETS:
+            df = sheets.get(sheet)
+            if df is None or 'name' not in df.columns:
+                continue
+            ids = df['ID'] if 'ID' in df.columns else pd.Series([''] * len(df))
+            descriptions = df['description'] if 'description' in df.columns else pd.Series([''] * len(df))
+            for object_id, name, description in zip(ids, df['name'], descriptions):
+                if pd.isna(name):
+                    continue
+                description = '' if pd.isna(description) else str(description)
+                documents.append((sheet, '' if pd.isna(object_id) else str(object_id), str(name), description))
+
+        # Term frequencies per document, the name words weighted up
+        vocabulary = {}
+        rows, columns, counts, lengths = [], [], [], []
+        for position, (_, object_id, name, description) in enumerate(documents):
+            frequencies = {}
+            for term in tokenize(f'{object_id} {name}'):
+                frequencies[term] = frequencies.get(term, 0) + NAME_WEIGHT
+            for term in tokenize(description):
+                frequencies[term] = frequencies.get(term, 0) + 1
+            lengths.append(sum(frequencies.values()))
+            for term, count in frequencies.items():
+                rows.append(position)
+                columns.append(vocabulary.setdefault(term, len(vocabulary)))
+                counts.append(count)
+
+        terms = np.array(sorted(vocabulary), dtype=str)
+        order = np.empty(len(vocabulary), dtype=np.int64)
+        order[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = order[np.asarray(columns, dtype=np.int64)]
+        counts = np.asarray(counts, dtype=np.float64)
+
+        lengths = np.asarray(lengths, dtype=np.float64)
+        average = lengths.mean() if len(lengths) else 1.0
+        document_frequency = np.bincount(columns, minlength=len(terms))
+        idf = np.log1p((len(documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / average)
+        data = idf[columns] * counts * (BM25_K1 + 1) / (counts + norm)
+        weights = sparse.csr_matrix((data, (rows, columns)), shape=(len(documents), len(terms)))
+
+        return cls(
+            terms, weights,
+            np.array([document[0] for document in documents], dtype=str),
+            np.array([document[1] for document in documents], dtype=str),
+            np.array([document[2] for document in documents], dtype=str),
+            np.array([document[3][:SNIPPET_LENGTH] for document in documents], dtype=str),
+        )
+
+    # Column positions of a term, or of every term starting with it
+    def _term_positions(self, term, prefix=False):
+        start = np.searchsorted(self.terms, term, side='left')
+        if not prefix:
+            return [start] if start < len(self.terms) and self.terms[start] == term else []
+        stop = np.searchsorted(self.terms, term + '￿', side='left')
+        return list(range(start, min(stop, start + MAX_PREFIX_TERMS)))
+
+    # Documents ranked by BM25 for the query, the last word also matching as a prefix so
+    # results follow the query as it is typed. An ATT&CK ID matches its object first.
+    def search(self, query, sheets=None, k=50):
+        scores = np.zeros(len(self.ids))
+        words = query.split()
+        for word in words:
+            if ID_PATTERN.match(word):
+                for position in self._id_positions.get(word.upper(), []):
+                    scores[position] += 1000.0
+        terms = tokenize(query)
+        for number, term in enumerate(terms):
+            positions = self._term_positions(term, prefix=number == len(terms) - 1 and not query.endswith(' '))
+            if not positions:
+                continue
+            columns = self.weights[:, positions]
+            # Several completions of a prefix count as the best one
+            best = columns.max(axis=1).toarray().ravel() if len(positions) > 1 else columns.toarray().ravel()
+            scores += best
+
+        if sheets is not None:
+            scores[~np.isin(self.sheets, list(sheets))] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+        return pd.DataFrame({
+            'Sheet': self.sheets[hits],
+            'ID': self.ids[hits],
+            'Name': self.names[hits],
+            'Score': scores[hits].round(2),
+            'Description': self.snippets[hits],
+        })
+
+    def save(self, path):
+        tmp_path = f'{path}.{threading.get_ident()}.tmp.npz'
+        np.savez(tmp_path, version=INDEX_VERSION, terms=self.terms, data=self.weights.data,
+                 indices=self.weights.indices, indptr=self.weights.indptr, shape=self.weights.shape,
+                 sheets=self.sheets, ids=self.ids, names=self.names, snippets=self.snippets)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                if int(stored['version']) != INDEX_VERSION:
+                    return None
+                weights = sparse.csc_matrix((stored['data'], stored['indices'], stored['indptr']),
+                                            shape=tuple(stored['shape']))
+                return cls(stored['terms'], weights, stored['sheets'], stored['ids'], stored['names'], stored['snippets'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+# Search index of a dataset, read from next to its columnar store when it was built
+# before. Datasets without a store (e.g. the benchmark copies) are indexed in memory.
+def load_search_index(dataset):
+    path = None
+    if cache.read_manifest(dataset.key) is not None:
+        path = os.path.join(cache.cache_path(dataset.key), INDEX_FILE)
+        index = SearchIndex.load(path)
+        if index is not None:
+            return index
+
+    index = SearchIndex.build(dataset.sheets)
+    if path is not None:
+        try:
+            index.save(path)
+        except OSError as error:
+            logger.warning("Could not write the search index to %s: %s", path, error)
+    return index
@@ -0,0 +1,90 @@
+import streamlit as st
+
+from attack_data.registry import DatasetLease, DatasetRegistry
+
+
+@st.cache_resource
+def get_registry():
+    return DatasetRegistry()
+
+
+# Dataset of an upload, or of the union of several uploads (one workbook per domain), with
+# a reference taken for the session
+def load_upload(upload):
+    registry = get_registry()
+    if isinstance(upload, (list, tuple)):
+        return registry.union(registry.load_all(upload), acquire=True)
+    return registry.load_dataset(upload, acquire=True)
+
+
+# Streamlit file IDs of an upload, None for files without one (paths, buffers)
+def upload_id(upload):
+    uploads = upload if isinstance(upload, (list, tuple)) else [upload]
+    file_ids = [getattr(file, 'file_id', None) for file in uploads]
+    return None if None in file_ids else tuple(file_ids)
+
+
+# Dataset of an upload held by the session under name, with its reference to it. Reruns
+# with the same upload reuse the dataset instead of copying and hashing the file again.
+def _open_leased(upload, name):
+    registry = get_registry()
+    file_ids = upload_id(upload)
+    lease = st.session_state.get(f'{name}_lease')
+    if lease is not None and file_ids is not None and st.session_state.get(f'{name}_upload_id') == file_ids:
+        dataset = registry.get(lease.key)
+        if dataset is not None:
+            return dataset
+
+    dataset = load_upload(upload)
+    st.session_state[f'{name}_lease'] = DatasetLease(registry, dataset.key)
+    st.session_state[f'{name}_upload_id'] = file_ids
+    if lease is not None:
+        lease.release()
+    return dataset
+
+
+# Register the uploaded workbook and keep only its key in the session
+def open_upload(upload):
+    dataset = _open_leased(upload, 'dataset')
+    st.session_state['dataset_key'] = dataset.key
+    return dataset
+
+
+# Dataset of another upload (e.g. a newer release to compare with), shared through the
+# registry without replacing the dataset of the session
+def open_comparison(upload):
+    return _open_leased(upload, 'comparison')
+
+
+# Dataset of the current session, reloaded from the upload if it was evicted
+def current_dataset():
+    key = st.session_state.get('dataset_key')
+    if key is None:
+        return None
+    dataset = get_registry().get(key)
+    if dataset is None and 'upload' in st.session_state:
+        dataset = open_upload(st.session_state['upload'])
+    return dataset
+
+
+# Make the comparison dataset the dataset of the session. Its reference moves over before
+# the previous dataset's is released, so it is never left unreferenced in between.
+def switch_to_comparison():
+    lease = st.session_state.pop('comparison_lease', None)
+    file_ids = st.session_state.pop('comparison_upload_id', None)
+    previous = st.session_state.pop('dataset_lease', None)
+    if lease is not None:
+        st.session_state['dataset_lease'] = lease
+        st.session_state['dataset_upload_id'] = file_ids
+        st.session_state['dataset_key'] = lease.key
+    if previous is not None:
+        previous.release()
+
+
+def release_dataset():
+    st.session_state.pop('dataset_key', None)
+    for name in ('dataset', 'comparison'):
+        st.session_state.pop(f'{name}_upload_id', None)
+        lease = st.session_state.pop(f'{name}_lease', None)
+        if lease is not None:
+            lease.release()
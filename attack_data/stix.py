@@ -0,0 +1,220 @@
+import json
+from datetime import datetime
+
+import pandas as pd
+
+# orjson is optional, it parses a full ATT&CK bundle several times faster than json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# STIX object type -> the type names used by the ATT&CK workbooks
+OBJECT_TYPES = {
+    'attack-pattern': 'technique',
+    'malware': 'software',
+    'tool': 'software',
+    'intrusion-set': 'group',
+    'campaign': 'campaign',
+    'course-of-action': 'mitigation',
+    'x-mitre-data-component': 'datacomponent',
+    'x-mitre-tactic': 'tactic',
+}
+# Relationship types exported to the relationships sheet
+MAPPING_TYPES = {'uses', 'mitigates', 'detects', 'attributed-to'}
+
+COMMON_COLUMNS = ['ID', 'STIX ID', 'name', 'description', 'url', 'created', 'last modified', 'domain', 'version']
+RELATIONSHIP_COLUMNS = ['source ID', 'source name', 'source ref', 'source type', 'mapping type',
+                        'target ID', 'target name', 'target ref', 'target type',
+                        'mapping description', 'STIX ID', 'created', 'last modified']
+
+
+def is_stix_bundle(data):
+    return data.lstrip()[:1] == b'{'
+
+
+def parse_bundle(data):
+    bundle = orjson.loads(data) if orjson is not None else json.loads(data)
+    return bundle.get('objects', [])
+
+
+# '2017-05-31T21:30:19.735Z' -> '31 May 2017', the date format of the workbooks
+def _date(value):
+    if not value:
+        return None
+    return datetime.strptime(value[:10], '%Y-%m-%d').strftime('%d %B %Y')
+
+
+def _join(values, sep=', '):
+    return sep.join(values) if values else None
+
+
+def _version(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _attack_reference(obj):
+    for reference in obj.get('external_references', []):
+        if reference.get('source_name') in ('mitre-attack', 'mitre-mobile-attack', 'mitre-ics-attack'):
+            return reference
+    return {}
+
+
+def _active(obj):
+    return not obj.get('revoked') and not obj.get('x_mitre_deprecated')
+
+
+def _common(obj):
+    reference = _attack_reference(obj)
+    return {
+        'ID': reference.get('external_id'),
+        'STIX ID': obj['id'],
+        'name': obj.get('name'),
+        'description': obj.get('description'),
+        'url': reference.get('url'),
+        'created': _date(obj.get('created')),
+        'last modified': _date(obj.get('modified')),
+        'domain': _join(obj.get('x_mitre_domains'), ','),
+        'version': _version(obj.get('x_mitre_version')),
+    }
+
+
+def _techniques(objects, tactic_names, parents):
+    rows = []
+    for obj in objects:
+        row = _common(obj)
+        if obj.get('x_mitre_is_subtechnique') and obj['id'] in parents:
+            parent = parents[obj['id']]
+            row['name'] = f"{parent.get('name')}: {obj.get('name')}"
+            row['sub-technique of'] = _attack_reference(parent).get('external_id')
+        else:
+            row['sub-technique of'] = None
+        phases = [phase['phase_name'] for phase in obj.get('kill_chain_phases', [])]
+        row.update({
+            'tactics': _join([tactic_names.get(phase, phase.replace('-', ' ').title()) for phase in phases]),
+            'detection': obj.get('x_mitre_detection'),
+            'platforms': _join(obj.get('x_mitre_platforms')),
+            'data sources': _join(obj.get('x_mitre_data_sources')),
+            'is sub-technique': bool(obj.get('x_mitre_is_subtechnique', False)),
+            'defenses bypassed': _join(obj.get('x_mitre_defense_bypassed')),
+            'contributors': _join(obj.get('x_mitre_contributors'), '; '),
+            'permissions required': _join(obj.get('x_mitre_permissions_required')),
+            'system requirements': _join(obj.get('x_mitre_system_requirements')),
+            'impact type': _join(obj.get('x_mitre_impact_type')),
+            'effective permissions': _join(obj.get('x_mitre_effective_permissions')),
+        })
+        rows.append(row)
+    return rows
+
+
+def _software(objects):
+    rows = []
+    for obj in objects:
+        row = _common(obj)
+        row.update({
+            'contributors': _join(obj.get('x_mitre_contributors'), '; '),
+            'platforms': _join(obj.get('x_mitre_platforms')),
+            # The first alias is the name itself
+            'aliases': _join(obj.get('x_mitre_aliases', [])[1:]),
+            'type': obj['type'],
+        })
+        rows.append(row)
+    return rows
+
+
+def _groups(objects):
+    rows = []
+    for obj in objects:
+        row = _common(obj)
+        row.update({
+            'contributors': _join(obj.get('x_mitre_contributors'), '; '),
+            'associated groups': _join(obj.get('aliases', [])[1:]),
+        })
+        rows.append(row)
+    return rows
+
+
+def _campaigns(objects):
+    rows = []
+    for obj in objects:
+        row = _common(obj)
+        row.update({
+            'associated campaigns': _join(obj.get('aliases', [])[1:]),
+            'first seen': _date(obj.get('first_seen')),
+            'last seen': _date(obj.get('last_seen')),
+            'contributors': _join(obj.get('x_mitre_contributors'), '; '),
+        })
+        rows.append(row)
+    return rows
+
+
+def _relationships(objects, by_id):
+    rows = []
+    for obj in objects:
+        source = by_id.get(obj.get('source_ref'))
+        target = by_id.get(obj.get('target_ref'))
+        if source is None or target is None:
+            continue
+        rows.append({
+            'source ID': _attack_reference(source).get('external_id'),
+            'source name': source.get('name'),
+            'source ref': source['id'],
+            'source type': OBJECT_TYPES[source['type']],
+            'mapping type': obj['relationship_type'],
+            'target ID': _attack_reference(target).get('external_id'),
+            'target name': target.get('name'),
+            'target ref': target['id'],
+            'target type': OBJECT_TYPES[target['type']],
+            'mapping description': obj.get('description'),
+            'STIX ID': obj['id'],
+            'created': _date(obj.get('created')),
+            'last modified': _date(obj.get('modified')),
+        })
+    return rows
+
+
+def _frame(rows, columns):
+    df = pd.DataFrame(rows)
+    extra = [column for column in df.columns if column not in columns]
+    return df.reindex(columns=columns + extra)
+
+
+# Build the sheets the pages expect (relationships, techniques, software, groups,
+# campaigns, mitigations, tactics) from a STIX 2.1 ATT&CK bundle
+def load_bundle(data):
+    objects = [obj for obj in parse_bundle(data) if _active(obj)]
+
+    # One pass to bucket the objects by type
+    by_type = {}
+    for obj in objects:
+        by_type.setdefault(obj['type'], []).append(obj)
+    by_id = {obj['id']: obj for obj in objects if obj['type'] in OBJECT_TYPES}
+
+    tactic_names = {tactic.get('x_mitre_shortname'): tactic.get('name') for tactic in by_type.get('x-mitre-tactic', [])}
+    relationships = by_type.get('relationship', [])
+    parents = {
+        relationship['source_ref']: by_id[relationship['target_ref']]
+        for relationship in relationships
+        if relationship.get('relationship_type') == 'subtechnique-of' and relationship.get('target_ref') in by_id
+    }
+    mapped = [relationship for relationship in relationships if relationship.get('relationship_type') in MAPPING_TYPES]
+
+    return {
+        'techniques': _frame(_techniques(by_type.get('attack-pattern', []), tactic_names, parents),
+                             COMMON_COLUMNS + ['tactics', 'detection', 'platforms', 'data sources', 'is sub-technique',
+                                               'sub-technique of', 'defenses bypassed', 'contributors',
+                                               'permissions required', 'system requirements', 'impact type',
+                                               'effective permissions']),
+        'tactics': _frame([_common(obj) for obj in by_type.get('x-mitre-tactic', [])], COMMON_COLUMNS),
+        'software': _frame(_software(by_type.get('malware', []) + by_type.get('tool', [])),
+                           COMMON_COLUMNS + ['contributors', 'platforms', 'aliases', 'type']),
+        'groups': _frame(_groups(by_type.get('intrusion-set', [])),
+                         COMMON_COLUMNS + ['contributors', 'associated groups']),
+        'campaigns': _frame(_campaigns(by_type.get('campaign', [])),
+                            COMMON_COLUMNS + ['associated campaigns', 'first seen', 'last seen', 'contributors']),
+        'mitigations': _frame([_common(obj) for obj in by_type.get('course-of-action', [])], COMMON_COLUMNS),
+        'relationships': _frame(_relationships(mapped, by_id), RELATIONSHIP_COLUMNS),
+    }
@@ -0,0 +1,35 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from attack_data.nltk_resources import nltk_resources
+
+
+def remove_stopwords(text, stop_words, tokenize):
+    if not isinstance(text, str):
+        return ""
+    words = tokenize(text)
+    return ' '.join([word for word in words if word.lower() not in stop_words])
+
+
+# TF-IDF model of one text column of a sheet. Tokenizing and fitting happen once,
+# a filter only sums the sparse rows it selects.
+class CorpusModel:
+    def __init__(self, series):
+        stop_words, tokenize = nltk_resources()
+        documents = [remove_stopwords(text, stop_words, tokenize) for text in series]
+        self.empty = not any(document.strip() for document in documents)
+        if self.empty:
+            self.matrix = None
+            self.features = np.array([])
+            return
+        vectorizer = TfidfVectorizer()
+        self.matrix = vectorizer.fit_transform(documents).tocsr()
+        self.features = vectorizer.get_feature_names_out()
+
+    # Summed TF-IDF weight of every word over the given row positions
+    def weights(self, positions):
+        if self.empty or len(positions) == 0:
+            return {}
+        totals = np.asarray(self.matrix[positions].sum(axis=0)).ravel()
+        nonzero = np.flatnonzero(totals)
+        return {self.features[i]: float(totals[i]) for i in nonzero}
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+# Format of the 'first seen' / 'last seen' cells of the ATT&CK workbooks, other values
+# (e.g. ISO dates of STIX bundles) fall back to the generic parser
+DATE_FORMAT = '%d %B %Y'
+TIMELINE_COLUMNS = ['ID', 'name', 'first seen', 'last seen', 'year', 'duration']
+
+
+def parse_dates(values):
+    dates = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    unparsed = dates.isna() & values.notna()
+    if unparsed.any():
+        fallback = pd.to_datetime(values[unparsed], format='mixed', errors='coerce', utc=True)
+        dates[unparsed] = fallback.dt.tz_localize(None)
+    return dates
+
+
+# Campaign dates parsed once per dataset into typed columns, with an interval index of
+# the active periods. Queries return new frames, the table itself is never modified.
+class CampaignTimeline:
+    def __init__(self, campaigns, attributions=None):
+        first_seen = parse_dates(campaigns['first seen'].reset_index(drop=True))
+        last_seen = parse_dates(campaigns['last seen'].reset_index(drop=True))
+        # A campaign without an end date (or ending before its start) is active on its first day
+        last_seen = last_seen.where(last_seen >= first_seen, first_seen)
+        self._table = pd.DataFrame({
+            'ID': campaigns['ID'].reset_index(drop=True) if 'ID' in campaigns.columns else None,
+            'name': campaigns['name'].reset_index(drop=True),
+            'first seen': first_seen,
+            'last seen': last_seen,
+            'year': first_seen.dt.year.astype('Int64'),
+            'duration': (last_seen - first_seen).dt.days.astype('Int64'),
+        }, columns=TIMELINE_COLUMNS)
+
+        if attributions is None:
+            attributions = pd.DataFrame({'campaign': [], 'group': []})
+        self.attributions = attributions.drop_duplicates().reset_index(drop=True)
+
+        dated = self._table.dropna(subset=['first seen'])
+        self._dated = dated.merge(self.group_labels(), on='name', how='left')
+        self.intervals = pd.IntervalIndex.from_arrays(self._dated['first seen'], self._dated['last seen'], closed='both')
+
+    def __len__(self):
+        return len(self._table)
+
+    def frame(self):
+        return self._table.copy()
+
+    def start(self):
+        return self._dated['first seen'].min() if len(self._dated) else None
+
+    def end(self):
+        return self._dated['last seen'].max() if len(self._dated) else None
+
+    # Campaigns with at least one active day between start and end, ordered by start
+    def active(self, start, end):
+        window = pd.Interval(pd.Timestamp(start), pd.Timestamp(end), closed='both')
+        active = self._dated[self.intervals.overlaps(window)]
+        return active.sort_values(['first seen', 'name'], kind='stable').reset_index(drop=True)
+
+    # Groups of every campaign joined into one label, 'Unattributed' without any
+    def group_labels(self):
+        labels = self.attributions.groupby('campaign', sort=False)['group'].agg(lambda groups: ', '.join(sorted(groups)))
+        labels = labels.rename_axis('name').rename('group').reset_index()
+        names = self._table[['name']].drop_duplicates()
+        labels = names.merge(labels, on='name', how='left')
+        labels['group'] = labels['group'].fillna('Unattributed')
+        return labels
+
+    # Pairs of campaigns of the same group whose active periods overlap, optionally of one group
+    def overlapping(self, group=None):
+        attributed = self.attributions
+        if group is not None:
+            attributed = attributed[attributed['group'] == group]
+        dated = self._dated[['name', 'first seen', 'last seen']].drop_duplicates('name')
+        campaigns = attributed.merge(dated, left_on='campaign', right_on='name')[['group', 'name', 'first seen', 'last seen']]
+        pairs = campaigns.merge(campaigns, on='group', suffixes=('', ' other'))
+        pairs = pairs[(pairs['name'] < pairs['name other'])
+                      & (pairs['first seen'] <= pairs['last seen other'])
+                      & (pairs['first seen other'] <= pairs['last seen'])]
+        overlap_start = pairs[['first seen', 'first seen other']].max(axis=1)
+        overlap_end = pairs[['last seen', 'last seen other']].min(axis=1)
+        result = pd.DataFrame({
+            'Group': pairs['group'],
+            'Campaign': pairs['name'],
+            'Other Campaign': pairs['name other'],
+            'Overlap Start': overlap_start,
+            'Overlap End': overlap_end,
+            'Overlap Days': (overlap_end - overlap_start).dt.days + 1,
+        })
+        return result.sort_values(['Group', 'Overlap Start', 'Campaign'], kind='stable').reset_index(drop=True)
+
+    # Campaigns active in and started in every month between the first and the last one.
+    # Each campaign adds +1 at its first month and -1 after its last, the cumulative sum
+    # is the number of active campaigns.
+    def monthly_activity(self):
+        if not len(self._dated):
+            return pd.DataFrame({'Month': pd.Series([], dtype='datetime64[ns]'),
+                                 'Active Campaigns': [], 'Started Campaigns': []})
+        first_seen = self._dated['first seen']
+        last_seen = self._dated['last seen']
+        start_months = (first_seen.dt.year * 12 + first_seen.dt.month - 1).to_numpy()
+        end_months = (last_seen.dt.year * 12 + last_seen.dt.month - 1).to_numpy()
+        first = start_months.min()
+        months = pd.period_range(first_seen.min(), last_seen.max(), freq='M')
+        start_codes = start_months - first
+        end_codes = end_months - first
+
+        changes = np.zeros(len(months) + 1, dtype=np.int64)
+        np.add.at(changes, start_codes, 1)
+        np.add.at(changes, end_codes + 1, -1)
+        return pd.DataFrame({
+            'Month': months.to_timestamp(),
+            'Active Campaigns': np.cumsum(changes)[:-1],
+            'Started Campaigns': np.bincount(start_codes, minlength=len(months)),
+        })
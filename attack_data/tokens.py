@@ -0,0 +1,41 @@
+import re
+
+import numpy as np
+
+
+# Boolean row x token membership matrix of a comma separated column such as
+# 'platforms' or 'tactics', built once with vectorized string ops
+class TokenIndex:
+    def __init__(self, series, sep=','):
+        text = series.astype('string').fillna('')
+        normalized = text.str.replace(r'\s*' + re.escape(sep) + r'\s*', sep, regex=True).str.strip()
+        dummies = normalized.str.get_dummies(sep=sep)
+        dummies = dummies.loc[:, [token for token in dummies.columns if token]]
+
+        self.tokens = sorted(dummies.columns)
+        self.matrix = dummies[self.tokens].to_numpy(dtype=bool)
+        self._positions = {token: position for position, token in enumerate(self.tokens)}
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def _columns(self, tokens):
+        return [self._positions[token] for token in tokens if token in self._positions]
+
+    # Rows containing at least one of the tokens
+    def any_of(self, tokens):
+        columns = self._columns(tokens)
+        if not columns:
+            return np.zeros(len(self), dtype=bool)
+        return self.matrix[:, columns].any(axis=1)
+
+    # Rows containing every one of the tokens
+    def all_of(self, tokens):
+        columns = self._columns(tokens)
+        if len(columns) < len(set(tokens)):
+            return np.zeros(len(self), dtype=bool)
+        return self.matrix[:, columns].all(axis=1)
+
+    # Number of rows per token
+    def counts(self):
+        return dict(zip(self.tokens, self.matrix.sum(axis=0).tolist()))
@@ -0,0 +1,244 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Tables and figures of the Trends views, computed from a Dataset. The Trends page and
+# the batch report both draw their charts from here.
+
+
+# Most used techniques
+def technique_counts(dataset, min_count=0):
+    return dataset.aggregates().counts('uses', 'technique', 'target name', name_label='Technique',
+                                       count_label='Usage Count', min_count=min_count)
+
+
+def techniques_figure(technique_counts, min_count):
+    fig = px.bar(technique_counts, x='Technique', y='Usage Count',
+                 title=f'Most Used Techniques in MITRE ATT&CK ({min_count}+ Uses)',
+                 labels={'Usage Count': 'Number of Uses', 'Technique': 'Techniques'},
+                 color='Usage Count', color_continuous_scale=px.colors.sequential.Viridis)
+    fig.update_layout(width=1000, height=800)
+    return fig
+
+
+# Most used software, more than min_count uses
+def software_counts(dataset, min_count=0):
+    return dataset.aggregates().counts('uses', 'software', 'target name', name_label='Software',
+                                       count_label='Usage Count', min_count=min_count, strict=True)
+
+
+def software_figure(software_counts, min_count):
+    fig = px.pie(software_counts, names='Software', values='Usage Count',
+                 title=f'Most Used Software in MITRE ATT&CK ({min_count}+)',
+                 color='Software', color_discrete_sequence=px.colors.sequential.Viridis)
+    fig.update_layout(width=800, height=800)
+    return fig
+
+
+# Total usage of the given software per platform of the software sheet
+def software_platform_usage(dataset, software_counts):
+    merged_data = software_counts.merge(dataset.sheets['software'][['name', 'platforms']],
+                                        left_on='Software', right_on='name', how='left')
+    # One row per platform when several are listed
+    merged_data['platforms'] = merged_data['platforms'].str.split(', ')
+    merged_data = merged_data.explode('platforms')
+    return merged_data.groupby('platforms')['Usage Count'].sum().reset_index()
+
+
+def platform_usage_figure(platform_usage):
+    fig = px.bar(platform_usage, x='platforms', y='Usage Count',
+                 title='Total Software Usage per Platform',
+                 labels={'platforms': 'Platform', 'Usage Count': 'Total Usage Count'},
+                 color='Usage Count', color_continuous_scale=px.colors.sequential.Viridis)
+    fig.update_layout(width=800, height=600)
+    return fig
+
+
+# Data components ('detects') or mitigations ('mitigates') with more than min_count techniques
+def source_counts(dataset, relationship_type, source_name, chart_title, min_count=20):
+    return dataset.aggregates().counts(relationship_type, 'technique', 'source name', name_label=source_name,
+                                       count_label=f'{chart_title} Count', min_count=min_count, strict=True)
+
+
+def source_figure(source_counts, source_name, source_type, mapping_type, chart_title):
+    return px.bar(source_counts, x=source_name, y=f'{chart_title} Count',
+                  title=f'Most Used {source_type} to {mapping_type} Techniques (20+ usage)',
+                  labels={f'{chart_title} Count': f'{chart_title} Count', source_name: source_name},
+                  color=f'{chart_title} Count', color_continuous_scale=px.colors.sequential.Plasma)
+
+
+def bubble_table(dataset, relationship_type, source_counts, source_name):
+    technique_counts = dataset.aggregates().counts(relationship_type, 'technique', 'target name',
+                                                   name_label='Technique', count_label='Technique Count')
+    bubbles = source_counts.merge(technique_counts, how='left', left_on=source_name, right_on='Technique')
+    bubbles['Technique Count'] = bubbles['Technique Count'].fillna(0)
+    return bubbles
+
+
+def bubble_figure(bubbles, source_name, source_type, chart_title, render_mode='auto'):
+    return px.scatter(bubbles, x=f'{chart_title} Count', y='Technique Count',
+                      size=f'{chart_title} Count', color=source_name,
+                      hover_name=source_name, title=f'Bubble Chart of {source_type} Components',
+                      labels={f'{chart_title} Count': f'{chart_title} Count', 'Technique Count': 'Number of Associated Techniques'},
+                      size_max=60, template='plotly', render_mode=render_mode)
+
+
+# Coverage of every group by one relationship type: 'Detected' or 'Mitigated'
+def coverage_table(dataset, label):
+    summary = dataset.coverage().summary()
+    columns = ['Group', 'Techniques Used', label, f'Not {label}', f'{label} Share']
+    return summary[columns].sort_values([f'Not {label}', 'Group'], ascending=[False, True], kind='stable')
+
+
+# Covered and uncovered techniques of the groups with the most gaps
+def coverage_figure(coverage, label, k=30):
+    fig = px.bar(coverage.head(k), x='Group', y=[label, f'Not {label}'],
+                 title=f'Techniques {label} for the {k} Groups with the Most Gaps',
+                 labels={'value': 'Techniques', 'variable': ''},
+                 color_discrete_sequence=[px.colors.sequential.Viridis[6], px.colors.sequential.Plasma[7]])
+    return fig
+
+
+# Campaign counts per group, most active groups first
+def campaign_group_counts(dataset):
+    return dataset.aggregates().counts('attributed-to', 'group', 'target name',
+                                       name_label='Group', count_label='Campaign Count')
+
+
+def campaign_group_figure(group_counts):
+    return px.bar(group_counts, x='Group', y='Campaign Count',
+                  title='Most Active Groups in MITRE ATT&CK by Campaigns',
+                  labels={'Campaign Count': 'Number of Campaigns', 'Group': 'Groups'},
+                  color='Campaign Count', color_continuous_scale=px.colors.sequential.Plasma)
+
+
+def campaigns_per_year(dataset):
+    campaign_counts = dataset.campaign_timeline().frame()['year'].value_counts().reset_index()
+    campaign_counts.columns = ['Year', 'Campaign Count']
+    return campaign_counts.sort_values(by='Year')
+
+
+def campaigns_per_year_figure(campaign_counts):
+    return px.line(campaign_counts, x='Year', y='Campaign Count',
+                   title='Number of Campaigns Detected Over Time',
+                   labels={'Year': 'Year', 'Campaign Count': 'Number of Campaigns'},
+                   markers=True)
+
+
+# Campaign names and counts per first seen year, latest first
+def campaigns_by_year(dataset):
+    campaigns = dataset.campaign_timeline().frame().dropna(subset=['year'])
+    campaigns_by_year = campaigns.groupby('year').agg(
+        Campaigns=('name', list),
+        Count=('name', 'count'),
+    ).reset_index()
+    return campaigns_by_year.sort_values('year', ascending=False)
+
+
+# Duration and number of distinct techniques of every campaign
+def campaign_durations(dataset):
+    techniques = dataset.relationship_index().slice('uses', 'technique')
+    techniques_count = techniques.groupby('source name')['target name'].nunique().reset_index()
+    techniques_count.columns = ['Campaign Name', 'Techniques Count']
+    campaign_data = dataset.campaign_timeline().frame().merge(techniques_count, left_on='name',
+                                                              right_on='Campaign Name', how='left')
+    campaign_data['Techniques Count'] = campaign_data['Techniques Count'].fillna(0)
+    return campaign_data
+
+
+def campaign_scatter_figure(campaign_data, render_mode='auto'):
+    return px.scatter(campaign_data, x='Techniques Count', y='duration',
+                      title='Campaign Duration vs. Techniques Count',
+                      labels={'duration': 'Duration (days)', 'Techniques Count': 'Number of Techniques'},
+                      hover_name='name', size='duration', color='name', size_max=25,
+                      template='plotly', render_mode=render_mode)
+
+
+# Gantt chart of campaigns as one horizontal bar trace, which stays responsive with
+# thousands of rows (one trace per group would not)
+def campaign_gantt_figure(active):
+    palette = px.colors.qualitative.Plotly
+    codes, _ = pd.factorize(active['group'])
+    days = (active['last seen'] - active['first seen'] + pd.Timedelta(days=1)) / pd.Timedelta(milliseconds=1)
+    customdata = list(zip(active['group'], active['first seen'].dt.strftime('%b %Y'), active['last seen'].dt.strftime('%b %Y')))
+    fig = go.Figure(go.Bar(
+        base=active['first seen'], x=days, y=active['name'], orientation='h',
+        marker_color=[palette[code % len(palette)] for code in codes], customdata=customdata,
+        hovertemplate='<b>%{y}</b><br>%{customdata[0]}<br>%{customdata[1]} - %{customdata[2]}<extra></extra>',
+    ))
+    fig.update_xaxes(type='date')
+    fig.update_yaxes(autorange='reversed', showticklabels=len(active) <= 100)
+    fig.update_layout(title='Campaign Timeline', height=min(max(400, 20 * len(active) + 150), 2000))
+    return fig
+
+
+def monthly_activity_figure(activity):
+    return px.bar(activity, x='Month', y='Active Campaigns', hover_data=['Started Campaigns'],
+                  title='Active Campaigns per Month',
+                  color='Active Campaigns', color_continuous_scale=px.colors.sequential.Plasma)
+
+
+def campaign_names(dataset):
+    return dataset.campaign_analytics().campaigns
+
+
+def campaign_technique_counts(dataset, campaign):
+    return dataset.campaign_analytics().techniques.counts(campaign, 'Technique', 'Usage Count')
+
+
+def campaign_techniques_figure(technique_counts, campaign):
+    fig = px.pie(technique_counts, names='Technique', values='Usage Count',
+                 title=f'Techniques Used by {campaign}',
+                 color='Technique', color_discrete_sequence=px.colors.sequential.Plasma)
+    fig.update_layout(width=500, height=500)
+    return fig
+
+
+# Techniques of one campaign counted by their tactics (as listed on the techniques sheet)
+def campaign_tactic_counts(dataset, campaign):
+    return dataset.campaign_analytics().tactics.counts(campaign, 'Tactics', 'Campaign Count')
+
+
+def campaign_tactics_figure(tactics_per_campaign, campaign):
+    fig = px.pie(tactics_per_campaign, names='Tactics', values='Campaign Count',
+                 title=f'Tactics Used by {campaign}',
+                 labels={'Tactics': 'Tactics', 'Campaign Count': 'Number of Campaigns'},
+                 color='Tactics', color_discrete_sequence=px.colors.sequential.Viridis)
+    fig.update_traces(textinfo='percent+label')
+    fig.update_layout(width=500, height=500)
+    return fig
+
+
+# Heatmap of campaigns against the techniques or tactics they use
+def campaign_matrix_figure(matrix, column_label):
+    fig = px.imshow(matrix, aspect='auto', color_continuous_scale=px.colors.sequential.Viridis,
+                    title=f'{column_label} Used by the Selected Campaigns',
+                    labels={'x': column_label, 'y': 'Campaign', 'color': 'Uses'})
+    fig.update_layout(height=max(400, 40 * len(matrix) + 250))
+    return fig
+
+
+def group_names(dataset):
+    return list(dataset.relationship_index().slice('uses', 'technique', 'group')['source name'].unique())
+
+
+# Techniques used by one group with their tactics
+def group_technique_table(dataset, group):
+    used = dataset.relationship_index().slice('uses', 'technique', 'group')
+    used = used[used['source name'] == group].drop_duplicates('target ID')
+    table = used[['target name', 'target ID']].rename(columns={'target name': 'Technique', 'target ID': 'ID'})
+    return table.merge(dataset.sheets['techniques'][['ID', 'tactics']], on='ID', how='left')
+
+
+def group_tactic_counts(group_techniques):
+    tactics = group_techniques['tactics'].dropna().str.split(', ').explode()
+    counts = tactics.value_counts().reset_index()
+    counts.columns = ['Tactics', 'Technique Count']
+    return counts
+
+
+def group_tactics_figure(tactic_counts, group):
+    fig = px.bar(tactic_counts, x='Tactics', y='Technique Count',
+                 title=f'Techniques Used by {group} per Tactic',
+                 color='Technique Count', color_continuous_scale=px.colors.sequential.Viridis)
+    return fig
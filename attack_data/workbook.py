@@ -0,0 +1,218 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from attack_data import cache
+from attack_data.cache import (content_hash, feather, file_bytes, pa, read_cached_sheet,
+                               read_manifest, store_sheet, store_workbook, write_manifest)
+from attack_data.stix import is_stix_bundle, load_bundle
+
+if pa is not None:
+    from attack_data.xlsx_stream import XlsxReader
+
+# Sheets the pages read first, parsed in the background as soon as a workbook is opened.
+# The large relationships sheet goes last so the small ones are not queued behind it.
+PREFETCH_SHEETS = ['techniques', 'software', 'campaigns', 'relationships']
+
+# Sheets are parsed one at a time: parsing holds the GIL, so a second worker only added
+# the buffers of another sheet to the peak memory
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='workbook')
+
+logger = logging.getLogger(__name__)
+
+
+# Sheet names straight from xl/workbook.xml, without parsing any sheet.
+# Returns None for files that are not xlsx (e.g. legacy .xls).
+def workbook_sheet_names(data):
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            root = ET.fromstring(archive.read('xl/workbook.xml'))
+    except (zipfile.BadZipFile, KeyError, ET.ParseError):
+        return None
+    return [element.get('name') for element in root.iter() if element.tag.endswith('}sheet')]
+
+
+# Read-only mapping of sheet name -> DataFrame that parses a sheet the first time it is
+# accessed, from the columnar store when it has been converted before, otherwise from
+# the workbook (and then converts it for the next load)
+class LazyWorkbook(Mapping):
+    def __init__(self, data, key=None, prefetch=PREFETCH_SHEETS):
+        self.key = key or content_hash(data)
+        self._data = data
+        self._excel = None
+        self._reader = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        # openpyxl workbooks are not thread safe, sheets are parsed one at a time
+        self._parse_lock = threading.Lock()
+
+        xlsx_names = workbook_sheet_names(data)
+        manifest = read_manifest(self.key) if feather is not None else None
+        if manifest is not None:
+            self._names = [entry['name'] for entry in manifest['sheets']]
+            self._files = {entry['name']: entry['file'] for entry in manifest['sheets'] if entry.get('file')}
+        else:
+            self._names = xlsx_names
+            if self._names is None:
+                self._names = self._open_excel().sheet_names
+            self._files = {}
+        # Sheets not read yet, the raw bytes and the parsers are dropped after the last one
+        self._pending = len(self._names)
+
+        # xlsx sheets are streamed into Arrow when pyarrow is available, legacy .xls and
+        # anything the streaming reader cannot handle go through read_excel
+        self._streamable = pa is not None and xlsx_names is not None
+
+        for name in prefetch:
+            if name in self._names:
+                self._submit(name)
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        return self._submit(name).result()
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def loaded(self, name):
+        future = self._futures.get(name)
+        return future is not None and future.done()
+
+    def _submit(self, name):
+        with self._lock:
+            future = self._futures.get(name)
+            if future is None:
+                future = _executor.submit(self._load, name)
+                self._futures[name] = future
+            return future
+
+    def _open_excel(self):
+        if self._excel is None:
+            self._excel = pd.ExcelFile(io.BytesIO(self._data))
+        return self._excel
+
+    # The streaming reader is built on first use, so a workbook served entirely from the
+    # store never builds one
+    def _open_reader(self):
+        with self._lock:
+            if self._reader is None and self._streamable:
+                self._reader = XlsxReader(self._data)
+            return self._reader
+
+    def _load(self, name):
+        try:
+            return self._read(name)
+        finally:
+            self._release_source()
+
+    def _read(self, name):
+        file_name = self._files.get(name)
+        if file_name is not None:
+            try:
+                return read_cached_sheet(self.key, file_name)
+            except (OSError, pa.ArrowException):
+                pass
+
+        df = None
+        reader = self._open_reader()
+        if reader is not None:
+            try:
+                df = reader.read_frame(name)
+            except (KeyError, ValueError, ET.ParseError, zipfile.BadZipFile) as error:
+                logger.warning("Streaming read of sheet '%s' failed, falling back to read_excel: %s", name, error)
+
+        if df is None:
+            with self._parse_lock:
+                df = self._open_excel().parse(name)
+        self._store(name, df)
+        return df
+
+    # Drop the raw bytes and the parsers once every sheet has been read, from the store
+    # or from the workbook
+    def _release_source(self):
+        with self._lock:
+            self._pending -= 1
+            if self._pending == 0:
+                self._excel = None
+                self._reader = None
+                self._data = None
+
+    def _store(self, name, df):
+        if feather is None:
+            return
+        try:
+            file_name = store_sheet(self.key, self._names.index(name), df)
+            with self._lock:
+                self._files[name] = file_name
+                write_manifest(self.key, self._names, self._files)
+        except (OSError, ValueError, TypeError) as error:
+            # The store is only an accelerator, a failed conversion must not break loading
+            logger.warning("Could not cache sheet '%s' of workbook %s: %s", name, self.key[:12], error)
+
+
+# Sheets of an uploaded file: a lazily parsed workbook, or the tables built from a STIX
+# bundle. Both are served from the columnar store once converted.
+def open_sheets(data, key=None):
+    key = key or content_hash(data)
+    if is_stix_bundle(data) and read_manifest(key) is None:
+        sheets = load_bundle(data)
+        try:
+            store_workbook(key, sheets)
+        except (OSError, ValueError, TypeError) as error:
+            logger.warning("Could not cache bundle %s: %s", key[:12], error)
+        return sheets
+    return LazyWorkbook(data, key)
+
+
+# Parse every sheet of a workbook into the columnar store, in a worker process
+def convert_task(data, key, cache_dir):
+    cache.CACHE_DIR = cache_dir
+    sheets = open_sheets(data, key)
+    for name in sheets:
+        sheets[name]
+    return key
+
+
+# Convert several (data, key) workbooks into the columnar store in parallel, one process
+# each: parsing holds the GIL, so threads would still parse them one after another. The
+# workbooks are then loaded from the store. Returns the keys that were converted.
+def convert_workbooks(workbooks, workers=None):
+    if feather is None or not workbooks:
+        return []
+    workers = workers or min(len(workbooks), os.cpu_count() or 1)
+    converted = []
+    # spawn: the workbook reader's thread pool does not survive a fork
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context) as executor:
+        futures = [executor.submit(convert_task, data, key, cache.CACHE_DIR) for data, key in workbooks]
+        for future in futures:
+            try:
+                converted.append(future.result())
+            except Exception as error:
+                # The workbook is parsed in this process instead, which reports the error
+                logger.warning("Could not convert a workbook in a worker process: %s", error)
+    return converted
+
+
+# Every sheet of the workbook as a plain dict, for scripts that need them all
+def load_workbook(file):
+    data = file_bytes(file)
+    if is_stix_bundle(data):
+        return dict(open_sheets(data))
+    workbook = LazyWorkbook(data, prefetch=[])
+    return {name: workbook[name] for name in workbook}
@@ -0,0 +1,341 @@
+import io
+import posixpath
+import re
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+BATCH_SIZE = 4096
+# Buffers of the reader come from the system allocator, which returns them to the OS once
+# a sheet is converted. The default mimalloc pool keeps freed pages mapped per thread,
+# which more than doubled the reader's share of the peak RSS.
+_POOL = pa.system_memory_pool()
+
+# Built-in number formats that display dates or times
+_DATE_FORMAT_IDS = set(range(14, 23)) | {45, 46, 47}
+_DATE_FORMAT_CODE = re.compile(r'[dmyhs]', re.IGNORECASE)
+_EXCEL_EPOCH = np.datetime64('1899-12-30', 'ns')
+
+# Text that read_excel reads as missing (pandas' default na_values)
+_NA_VALUES = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+              '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+
+_BOOLEANS = {'True': True, 'TRUE': True, 'true': True, 'False': False, 'FALSE': False, 'false': False}
+_BOOLEAN_VALUES = pa.array(list(_BOOLEANS))
+_TRUE_VALUES = pa.array([text for text, flag in _BOOLEANS.items() if flag])
+
+# Cell value kinds stored per column
+_STRING, _NUMBER, _DATE = 1, 2, 4
+
+
+def _column_index(reference):
+    index = 0
+    for char in reference:
+        if char.isalpha():
+            index = index * 26 + (ord(char.upper()) - 64)
+        else:
+            break
+    return index - 1
+
+
+# Map sheet name -> path of its XML part inside the archive
+def _sheet_paths(archive):
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(f'{PKG_REL_NS}Relationship')}
+    paths = {}
+    for sheet in workbook.iter(f'{NS}sheet'):
+        target = targets[sheet.get(f'{REL_NS}id')]
+        paths[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+    return paths
+
+
+# Shared strings table, string cells are stored as 4 byte indices into it. It stays a
+# list: each string column copies only the strings it uses into its own dictionary.
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    root = None
+    with archive.open('xl/sharedStrings.xml') as f:
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            if root is None:
+                root = element
+            if event == 'end' and element.tag == f'{NS}si':
+                strings.append(''.join(node.text or '' for node in element.iter(f'{NS}t')))
+                # Detach parsed items so the tree never holds the whole table
+                root.clear()
+    return strings
+
+
+# Indices of the cell styles that format numbers as dates
+def _date_styles(archive):
+    if 'xl/styles.xml' not in archive.namelist():
+        return set()
+    styles = ET.fromstring(archive.read('xl/styles.xml'))
+    date_formats = set(_DATE_FORMAT_IDS)
+    for number_format in styles.iter(f'{NS}numFmt'):
+        code = re.sub(r'"[^"]*"|\[[^\]]*\]', '', number_format.get('formatCode', ''))
+        if _DATE_FORMAT_CODE.search(code):
+            date_formats.add(int(number_format.get('numFmtId')))
+    cell_xfs = styles.find(f'{NS}cellXfs')
+    if cell_xfs is None:
+        return set()
+    return {index for index, xf in enumerate(cell_xfs.findall(f'{NS}xf'))
+            if int(xf.get('numFmtId', 0)) in date_formats}
+
+
+# Compact storage of one batch of one column: shared string indices, numbers and any
+# strings that are not in the shared table (inline strings, formula results)
+class _ColumnBatch:
+    def __init__(self, size):
+        self.codes = np.full(size, -1, dtype=np.int32)
+        self.numbers = np.full(size, np.nan)
+        self.extra = {}
+
+
+def _header_names(values):
+    names, seen = [], {}
+    for position, value in enumerate(values):
+        name = f'Unnamed: {position}' if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# Streaming reader over one xlsx archive. The shared strings table and date styles are
+# read once and reused by every sheet.
+class XlsxReader:
+    def __init__(self, data):
+        self._data = data
+        self._lock = threading.Lock()
+        self._strings = None
+        self._date_styles = None
+        with self._open() as archive:
+            self.sheet_paths = _sheet_paths(archive)
+
+    def _open(self):
+        return zipfile.ZipFile(io.BytesIO(self._data))
+
+    @property
+    def sheet_names(self):
+        return list(self.sheet_paths)
+
+    def _shared(self, archive):
+        with self._lock:
+            if self._strings is None:
+                self._strings = _shared_strings(archive)
+                self._date_styles = _date_styles(archive)
+        return self._strings, self._date_styles
+
+    # Stream one sheet into Arrow record batches with dictionary-encoded string columns.
+    # Rows are parsed with iterparse and cleared as soon as they are read, so the openpyxl
+    # cell objects are never built and memory stays proportional to the compact batches.
+    def read_table(self, sheet_name, batch_size=BATCH_SIZE):
+        with self._open() as archive:
+            strings, date_styles = self._shared(archive)
+            with archive.open(self.sheet_paths[sheet_name]) as f:
+                return _read_rows(f, strings, date_styles, batch_size)
+
+    def read_frame(self, sheet_name, batch_size=BATCH_SIZE):
+        return table_to_frame(self.read_table(sheet_name, batch_size))
+
+
+def _read_rows(f, strings, date_styles, batch_size):
+    header = None
+    batches = []
+    kinds = []
+    current, filled = None, 0
+    pending_empty = 0
+    expected_row = 1
+
+    def new_batch():
+        return [_ColumnBatch(batch_size) for _ in range(len(header))]
+
+    sheet_data = None
+    for event, element in ET.iterparse(f, events=('start', 'end')):
+        if event == 'start':
+            if element.tag == f'{NS}sheetData':
+                sheet_data = element
+            continue
+        if element.tag != f'{NS}row':
+            continue
+
+        row_number = int(element.get('r', expected_row))
+        cells = []
+        for cell in element.iter(f'{NS}c'):
+            reference = cell.get('r')
+            position = _column_index(reference) if reference else len(cells)
+            cell_type = cell.get('t', 'n')
+            value_node = cell.find(f'{NS}v')
+            if cell_type == 's' and value_node is not None:
+                cells.append((position, _STRING, int(value_node.text)))
+            elif cell_type == 'inlineStr':
+                inline = cell.find(f'{NS}is')
+                text = ''.join(node.text or '' for node in inline.iter(f'{NS}t')) if inline is not None else ''
+                cells.append((position, _STRING, text))
+            elif value_node is None or value_node.text is None:
+                continue
+            elif cell_type in ('str', 'e'):
+                cells.append((position, _STRING, value_node.text))
+            elif cell_type == 'b':
+                cells.append((position, _STRING, 'True' if value_node.text == '1' else 'False'))
+            else:
+                kind = _DATE if int(cell.get('s', 0)) in date_styles else _NUMBER
+                cells.append((position, kind, float(value_node.text)))
+        element.clear()
+        if sheet_data is not None:
+            sheet_data.clear()
+
+        if header is None:
+            values = {}
+            for position, kind, value in cells:
+                if kind == _STRING:
+                    values[position] = strings[value] if isinstance(value, int) else value
+                else:
+                    values[position] = _format_number(value)
+            width = max(values) + 1 if values else 0
+            header = _header_names([values.get(i) for i in range(width)])
+            kinds = [0] * len(header)
+            current = new_batch()
+            expected_row = row_number + 1
+            continue
+
+        # Gaps and empty rows become empty records, unless they trail the sheet
+        pending_empty += row_number - expected_row
+        expected_row = row_number + 1
+        if not cells:
+            pending_empty += 1
+            continue
+
+        # Cells right of the header get 'Unnamed' columns, as read_excel does
+        width = max(position for position, _, _ in cells) + 1
+        while len(header) < width:
+            header.append(f'Unnamed: {len(header)}')
+            kinds.append(0)
+            current.append(_ColumnBatch(batch_size))
+
+        for _ in range(pending_empty + 1):
+            if filled == batch_size:
+                batches.append((current, filled))
+                current, filled = new_batch(), 0
+            filled += 1
+        pending_empty = 0
+
+        row = filled - 1
+        for position, kind, value in cells:
+            column = current[position]
+            kinds[position] |= kind
+            if kind == _STRING:
+                if isinstance(value, int):
+                    column.codes[row] = value
+                else:
+                    column.extra[row] = value
+            else:
+                column.numbers[row] = value
+
+    if header is None:
+        return pa.table({})
+    if filled:
+        batches.append((current, filled))
+    return _finish(header, kinds, batches, strings)
+
+
+def _finish(header, kinds, batches, strings):
+    columns = []
+    for position, kind in enumerate(kinds):
+        # Batches read before a column appeared have no storage for it
+        parts = [(columns_[position] if position < len(columns_) else _ColumnBatch(size), size)
+                 for columns_, size in batches]
+        numbers = np.concatenate([column.numbers[:size] for column, size in parts]) if parts else np.empty(0)
+        if kind == 0:
+            # Empty columns come back as float NaN from read_excel
+            column = pa.nulls(len(numbers), pa.float64(), memory_pool=_POOL)
+        elif kind & _STRING:
+            column = _dictionary_column(parts, numbers, strings)
+        elif kind == _DATE:
+            days = numbers * 86400 * 10**9
+            values = np.where(np.isnan(days), 0, days).astype(np.int64).astype('timedelta64[ns]') + _EXCEL_EPOCH
+            column = pa.array(values, mask=np.isnan(numbers), type=pa.timestamp('ns'), memory_pool=_POOL)
+        elif not np.isnan(numbers).any() and np.all(np.mod(numbers, 1) == 0):
+            # Whole-number columns without gaps are integers, as read_excel returns them
+            column = pa.array(numbers.astype(np.int64), memory_pool=_POOL)
+        else:
+            column = pa.array(numbers, mask=np.isnan(numbers), type=pa.float64(), memory_pool=_POOL)
+        columns.append(column)
+    return pa.table(columns, names=[str(name) for name in header])
+
+
+# One string column, dictionary-encoded over only the strings it uses. The dictionary is
+# sorted so the column sorts like the text, and NA-like text is read as missing the way
+# read_excel reads it.
+def _dictionary_column(parts, numbers, strings):
+    codes = np.concatenate([column.codes[:size] for column, size in parts])
+    # Text that is not in the shared table, numbers in text columns included
+    extra, offset = {}, 0
+    for column, size in parts:
+        for row, value in column.extra.items():
+            extra[offset + row] = value
+        offset += size
+    for row in np.flatnonzero(~np.isnan(numbers)):
+        extra[int(row)] = _format_number(numbers[row])
+
+    used = np.unique(codes[codes >= 0])
+    values = np.array([strings[code] for code in used] + list(extra.values()), dtype=object)
+    dictionary, inverse = np.unique(values, return_inverse=True)
+    indices = np.full(len(codes), -1, dtype=np.int32)
+    present = codes >= 0
+    indices[present] = inverse[np.searchsorted(used, codes[present])]
+    if extra:
+        indices[np.fromiter(extra, dtype=np.int64, count=len(extra))] = inverse[len(used):]
+
+    missing = np.isin(dictionary, list(_NA_VALUES))
+    if missing.any():
+        remap = np.cumsum(~missing, dtype=np.int32) - 1
+        remap[missing] = -1
+        indices = np.where(indices >= 0, remap[indices], -1).astype(np.int32)
+        dictionary = dictionary[~missing]
+    return pa.DictionaryArray.from_arrays(pa.array(indices, mask=indices < 0, type=pa.int32(), memory_pool=_POOL),
+                                          pa.array(dictionary.tolist(), pa.large_string(), memory_pool=_POOL),
+                                          memory_pool=_POOL)
+
+
+# Text columns that only hold booleans or numbers (e.g. 'version') are converted the way
+# read_excel does. Other text columns are decoded to plain strings, so every consumer gets
+# the same str columns as from read_excel and the store.
+def _text_column(column):
+    column = column.combine_chunks(memory_pool=_POOL)
+    dictionary = column.dictionary
+    if len(dictionary) == 0:
+        return pa.nulls(len(column), pa.float64(), memory_pool=_POOL)
+    if pc.all(pc.is_in(dictionary, value_set=_BOOLEAN_VALUES)).as_py():
+        flags = pc.take(pc.is_in(dictionary, value_set=_TRUE_VALUES), column.indices, memory_pool=_POOL)
+        return flags if flags.null_count == 0 else pc.cast(flags, pa.float64(), memory_pool=_POOL)
+    for number_type in (pa.int64(), pa.float64()):
+        try:
+            numbers = pc.take(pc.cast(dictionary, number_type), column.indices, memory_pool=_POOL)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            continue
+        return numbers if numbers.null_count == 0 else pc.cast(numbers, pa.float64(), memory_pool=_POOL)
+    return pc.take(dictionary, column.indices, memory_pool=_POOL)
+
+
+def table_to_frame(table):
+    columns = [_text_column(column) if pa.types.is_dictionary(column.type) else column for column in table.columns]
+    return pa.table(columns, names=table.column_names).to_pandas(memory_pool=_POOL)
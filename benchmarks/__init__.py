@@ -0,0 +1 @@
+# Headless benchmarks of the data and analysis stages of the pages
@@ -0,0 +1,315 @@
+import argparse
+import ctypes
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Peak resident memory comes from getrusage where /proc is not available
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from attack_data import cache
+from attack_data.registry import Dataset
+from attack_data.workbook import load_workbook
+
+DEFAULT_WORKBOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'enterprise.xlsx')
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SCALES = [1, 10, 100]
+# A stage is reported as a regression when it is this much slower than the baseline
+DEFAULT_TOLERANCE = 0.25
+# Differences below this are timer noise on the small stages
+MIN_REGRESSION_SECONDS = 0.01
+# Peak memory differences below this are allocator noise
+MIN_REGRESSION_BYTES = 8 * 2**20
+# Groups compared pairwise in the group comparison stage, about all groups of a release
+COMPARED_GROUPS = 150
+SCALED_COLUMNS = ['source ID', 'source name', 'source ref', 'source type', 'mapping type',
+                  'target ID', 'target name', 'target ref', 'target type']
+
+
+# Relationships sheet repeated `scale` times. Every copy gets its own sources so the
+# number of groups, software and campaigns grows with the table, the techniques stay shared.
+# Text columns no stage reads are left out so the 100x table fits in memory.
+def scale_relationships(df, scale):
+    if scale == 1:
+        return df
+    df = df[[column for column in SCALED_COLUMNS if column in df.columns]]
+    copies = [df]
+    for copy in range(1, scale):
+        scaled = df.copy()
+        for column in ['source ID', 'source name', 'source ref']:
+            scaled[column] = scaled[column] + f'-{copy}'
+        copies.append(scaled)
+    return pd.concat(copies, ignore_index=True)
+
+
+# Stages of the Data Filter and Trends pages, each a function of a fresh Dataset so the
+# structures it times are built from scratch
+def stage_relationship_index(dataset):
+    index = dataset.relationship_index()
+    for mapping_type, target_type in [('uses', 'technique'), ('uses', 'software'), ('detects', 'technique'),
+                                      ('mitigates', 'technique'), ('attributed-to', 'group')]:
+        index.slice(mapping_type, target_type)
+
+
+def stage_trends_aggregates(dataset):
+    aggregates = dataset.aggregates()
+    aggregates.counts('uses', 'technique', min_count=100)
+    aggregates.counts('uses', 'software', min_count=10, strict=True)
+    for mapping_type in ['detects', 'mitigates']:
+        aggregates.counts(mapping_type, 'technique', 'source name', min_count=20, strict=True)
+        aggregates.counts(mapping_type, 'technique', 'target name')
+    aggregates.counts('attributed-to', 'group')
+    campaigns = dataset.relationship_index().slice('uses', 'technique', 'campaign')['source name'].unique()
+    for campaign in campaigns[:2]:
+        aggregates.counts_for_source(campaign, 'uses', 'technique', 'campaign')
+
+
+def stage_sidebar_filters(dataset):
+    platforms = dataset.token_index('techniques', 'platforms')
+    tactics = dataset.token_index('techniques', 'tactics')
+    mask = platforms.any_of(platforms.tokens[:2]) & tactics.all_of(tactics.tokens[:1])
+    dataset.sheets['techniques'][mask]
+
+
+def stage_tfidf(dataset):
+    for column in ['name', 'description']:
+        model = dataset.corpus_model('techniques', column)
+        model.weights(np.arange(len(dataset.sheets['techniques'])))
+
+
+def stage_group_comparison(dataset):
+    matrix = dataset.group_techniques()
+    matrix.jaccard(matrix.rows[:COMPARED_GROUPS])
+    matrix.used_techniques(matrix.rows[:2])
+    if matrix.rows:
+        matrix.most_similar(matrix.rows[0], k=10)
+
+
+def stage_coverage(dataset):
+    coverage = dataset.coverage()
+    coverage.summary()
+    for group in coverage.groups[:COMPARED_GROUPS]:
+        coverage.gaps([group], 'detects')
+
+
+def stage_graph(dataset):
+    graph = dataset.graph()
+    groups = graph.names('group')
+    if groups:
+        graph.mitigations_for(groups[0])
+
+
+def stage_graph_centrality(dataset):
+    dataset.graph().centrality()
+
+
+SHEET_STAGES = {
+    'sidebar_filters': stage_sidebar_filters,
+    'tfidf': stage_tfidf,
+}
+RELATIONSHIP_STAGES = {
+    'relationship_index': stage_relationship_index,
+    'trends_aggregates': stage_trends_aggregates,
+    'group_comparison': stage_group_comparison,
+    'coverage': stage_coverage,
+    'graph': stage_graph,
+}
+# Stages that are too slow to repeat on the scaled tables
+UNSCALED_STAGES = {
+    'graph_centrality': stage_graph_centrality,
+}
+STAGES = dict(SHEET_STAGES, **RELATIONSHIP_STAGES, **UNSCALED_STAGES)
+
+
+# Resident memory of the process in bytes, and its peak since the last reset_peak_rss().
+# Linux keeps the peak in /proc and lets it be reset, elsewhere it is the peak of the
+# whole process.
+def current_rss():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return peak_rss()
+
+
+def peak_rss():
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+# Hand pages freed while preparing a stage back to the system, so the stage allocating
+# into them does not hide its peak (glibc only)
+def release_free_memory():
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+# Best wall time of `repeat` runs. A first untimed run pays for lazy imports and
+# process-wide caches such as the NLTK resources.
+def measure(function, repeat):
+    function()
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {'seconds': min(times), 'mean_seconds': sum(times) / len(times), 'runs': repeat}
+
+
+# Loading the workbook: parsed from the xlsx into an empty columnar store (a new directory
+# under cold_root for every run), then read back from the store as later sessions and
+# restarts do
+def load_stages(workbook, cold_root, warm_dir):
+    def cold():
+        cache.CACHE_DIR = tempfile.mkdtemp(dir=cold_root)
+        return load_workbook(workbook)
+
+    def warm():
+        cache.CACHE_DIR = warm_dir
+        return load_workbook(workbook)
+
+    return {'load_cold': cold, 'load_warm': warm}
+
+
+# Peak resident memory a stage adds over the loaded workbook, measured on its first run in
+# a fresh process so memory held by earlier stages does not count, nor hides the peak in
+# pages the allocator kept from a previous run. Unlike tracemalloc this sees the Arrow and
+# pandas buffers.
+def memory_task(workbook, cold_root, warm_dir, scale, name):
+    loads = load_stages(workbook, cold_root, warm_dir)
+    if name in loads:
+        function = loads[name]
+    else:
+        sheets = loads['load_warm']()
+        scaled_sheets = dict(sheets, relationships=scale_relationships(sheets['relationships'], scale))
+        stage = STAGES[name]
+        function = lambda: stage(Dataset(f'benchmark-{scale}', scaled_sheets))
+
+    gc.collect()
+    release_free_memory()
+    reset_peak_rss()
+    before = current_rss()
+    function()
+    return max(peak_rss() - before, 0)
+
+
+def run(workbook, scales, repeat):
+    report = {
+        'workbook': os.path.basename(workbook),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'scales': {},
+    }
+    cache_dir = cache.CACHE_DIR
+    context = multiprocessing.get_context('spawn')
+    try:
+        with tempfile.TemporaryDirectory() as directory, \
+                ProcessPoolExecutor(1, mp_context=context, max_tasks_per_child=1) as executor:
+            cold_root = tempfile.mkdtemp(dir=directory)
+            warm_dir = tempfile.mkdtemp(dir=directory)
+            loads = load_stages(workbook, cold_root, warm_dir)
+            load_results = {name: measure(function, repeat) for name, function in loads.items()}
+            sheets = loads['load_warm']()
+
+            for scale in scales:
+                relationships = scale_relationships(sheets['relationships'], scale)
+                scaled_sheets = dict(sheets, relationships=relationships)
+                results = dict(load_results) if scale == 1 else {}
+
+                stages = dict(RELATIONSHIP_STAGES)
+                if scale == 1:
+                    stages.update(SHEET_STAGES)
+                    stages.update(UNSCALED_STAGES)
+                for name, stage in stages.items():
+                    results[name] = measure(lambda: stage(Dataset(f'benchmark-{scale}', scaled_sheets)), repeat)
+                for name, result in results.items():
+                    result['peak_rss_bytes'] = executor.submit(memory_task, workbook, cold_root, warm_dir, scale, name).result()
+                    print(f"{scale:>4}x  {name:<20} {result['seconds'] * 1000:10.1f} ms  {result['peak_rss_bytes'] / 2**20:8.1f} MiB")
+                report['scales'][str(scale)] = {'relationship_rows': len(relationships), 'stages': results}
+    finally:
+        cache.CACHE_DIR = cache_dir
+    return report
+
+
+# Stages slower, or with a higher peak memory, than the baseline by more than the tolerance
+def regressions(report, baseline, tolerance):
+    found = []
+    for scale, results in report['scales'].items():
+        previous = baseline.get('scales', {}).get(scale, {}).get('stages', {})
+        for name, result in results['stages'].items():
+            if name not in previous:
+                continue
+            slowdown = result['seconds'] - previous[name]['seconds']
+            if slowdown > MIN_REGRESSION_SECONDS and result['seconds'] > previous[name]['seconds'] * (1 + tolerance):
+                found.append((scale, name, 'time', previous[name]['seconds'], result['seconds']))
+            before = previous[name].get('peak_rss_bytes')
+            if before is not None and result['peak_rss_bytes'] - before > MIN_REGRESSION_BYTES \
+                    and result['peak_rss_bytes'] > before * (1 + tolerance):
+                found.append((scale, name, 'memory', before, result['peak_rss_bytes']))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the data and analysis stages of the pages without a browser.")
+    parser.add_argument('--workbook', default=DEFAULT_WORKBOOK, help="ATT&CK workbook or STIX bundle to load")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help="Multiples of the relationships sheet to time the relationship stages on")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage, the best one is reported")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Where to write the JSON results")
+    parser.add_argument('--compare', help="Baseline JSON to compare the results with")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown or memory growth against the baseline, as a fraction")
+    args = parser.parse_args(argv)
+
+    report = run(args.workbook, args.scales, args.repeat)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        found = regressions(report, baseline, args.tolerance)
+        for scale, name, measure_name, before, after in found:
+            if measure_name == 'time':
+                print(f"Regression: {name} at {scale}x took {after * 1000:.1f} ms, baseline {before * 1000:.1f} ms")
+            else:
+                print(f"Regression: {name} at {scale}x peaked at {after / 2**20:.1f} MiB, baseline {before / 2**20:.1f} MiB")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
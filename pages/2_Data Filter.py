@@ -1,17 +1,15 @@
-import pandas as pd
+import hashlib
 import streamlit as st
 import plotly.express as px
 import numpy as np
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from sklearn.feature_extraction.text import TfidfVectorizer
 from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-
-# Download stopwords if not already available
-nltk.download('punkt')
-nltk.download('stopwords')
+from attack_data.diff import ReleaseDiff
+from attack_data.domains import dataset_domains
+from attack_data.figures import cached_figure, cap_categories, cap_hierarchy, show_all_categories
+from attack_data.navigator import layer_json, layers_zip
+from attack_data.preview import paged_dataframe
+from attack_data.profiling import finish_run, stage, start_run
+from attack_data.session import open_comparison, open_upload, release_dataset, switch_to_comparison
 
 st.set_page_config(
     page_title="Data Filtration",
@@ -19,33 +17,14 @@ st.set_page_config(
 )
 st.title("Multi-Sheet Data Analysis")
 
+# Time the stages of this run for the profiling panel and the metrics file
+start_run("Data Filter")
+
 # Function to clear the session state
 def clear_session_state():
-    st.session_state.pop('relationship_df', None)
-    st.session_state.pop('campaigns_df', None)
-    st.session_state.pop('techniques_df', None)
-    st.session_state.pop('software_df', None)
+    release_dataset()
     st.session_state.pop('upload', None)
 
-# Access the relationship data from session_state
-if 'relationship_df' in st.session_state and 'campaigns_df' in st.session_state and 'techniques_df' in st.session_state and 'software_df' in st.session_state:
-    df = st.session_state['relationship_df']
-    
-    df_techniques = df[(df['mapping type'] == 'uses') & (df['target type'] == 'technique')]
-    df_software = df[(df['mapping type'] == 'uses') & (df['target type'] == 'software')]
-    df_detection = df[(df['mapping type'] == 'detects') & (df['target type'] == 'technique')]
-    df_mitigation = df[(df['mapping type'] == 'mitigates') & (df['target type'] == 'technique')]
-    df_attribute_to = df[(df['mapping type'] == 'attributed-to') & (df['target type'] == 'group')]
-
-    df_campaigns = st.session_state['campaigns_df']
-    df_techniques_sheet = st.session_state['techniques_df']
-    df_software_sheet = st.session_state['software_df']
-
-
-@st.cache_data
-def load_data(file):
-    return pd.read_excel(file, sheet_name=None)
-
 # Sidebar Configuration
 with st.sidebar:
     st.header("Configuration")
@@ -55,29 +34,29 @@ with st.sidebar:
         if st.button("Remove Uploaded File"):
             clear_session_state()
 
-    # File uploader (resets after clearing the session state)
+    # File uploader (resets after clearing the session state). Several files, e.g. the
+    # Enterprise, Mobile and ICS workbooks, load concurrently and are analysed together.
     if 'upload' not in st.session_state:
-        upload = st.file_uploader("Choose an Excel file", type=["xlsx", "xls"])
-        if upload is not None:
-            st.session_state['upload'] = upload  # Save the uploaded file in session state
+        uploads = st.file_uploader("Choose Excel files or STIX bundles (one per domain)", type=["xlsx", "xls", "json"],
+                                   accept_multiple_files=True)
+        if uploads:
+            # Save the uploaded file(s) in session state
+            st.session_state['upload'] = uploads[0] if len(uploads) == 1 else uploads
 
     if 'upload' in st.session_state:
-        data_sheets = load_data(st.session_state['upload'])
-        sheet_names = list(data_sheets.keys())
-
-        # Store the relationship sheet in session_state
-        if 'techniques' in data_sheets:
-            st.session_state['techniques_df'] = data_sheets['techniques']
-        if 'software' in data_sheets:
-            st.session_state['software_df'] = data_sheets['software']
-        if 'relationships' in data_sheets:
-            st.session_state['relationship_df'] = data_sheets['relationships']
-        if 'campaigns' in data_sheets:
-            st.session_state['campaigns_df'] = data_sheets['campaigns']
+        # The workbook is parsed once per process and shared, the session only keeps its key
+        with stage("load"):
+            dataset = open_upload(st.session_state['upload'])
+            data_sheets = dataset.sheets
+            sheet_names = dataset.sheet_names()
+        domains = dataset_domains(dataset)
+        if len(domains) > 1:
+            st.caption(f"Domains: {', '.join(domains)}")
 
         # Allow user to select a sheet
         selected_sheet = st.selectbox("Select a Sheet to Analyze", options=sheet_names)
-        df = data_sheets[selected_sheet]
+        with stage("load"):
+            df = data_sheets[selected_sheet]
         st.subheader(f"Filters for {selected_sheet}")
         # Dynamically generate filter options based on available columns
         available_columns = df.columns.tolist()
@@ -86,151 +65,161 @@ with st.sidebar:
         name_filter = st.text_input("Name contains", "") if 'name' in available_columns else None
         domain_filter = st.multiselect("Domain", options=df["domain"].dropna().unique()) if 'domain' in available_columns else None
         
-        # Platforms Filter
+        # Platforms Filter, options come from the token index of the sheet
         if 'platforms' in available_columns:
-            all_platforms = df['platforms'].dropna().apply(lambda x: [p.strip() for p in x.split(',')] if isinstance(x, str) else x).explode()
-            unique_platforms = all_platforms.drop_duplicates()
-            platforms_filter = st.multiselect("Platforms", options=sorted(unique_platforms))
+            platforms_index = dataset.token_index(selected_sheet, 'platforms')
+            platforms_filter = st.multiselect("Platforms", options=platforms_index.tokens)
+            platforms_match_all = st.checkbox("Match all selected platforms", key="platforms_all")
         else:
             platforms_filter = None
 
         # Tactics Filter
         if 'tactics' in available_columns:
-            all_tactics = df['tactics'].dropna().apply(lambda x: [p.strip() for p in x.split(',')] if isinstance(x, str) else x).explode()
-            tactics_filter = st.multiselect("Tactics", options=sorted(all_tactics.drop_duplicates()))
+            tactics_index = dataset.token_index(selected_sheet, 'tactics')
+            tactics_filter = st.multiselect("Tactics", options=tactics_index.tokens)
+            tactics_match_all = st.checkbox("Match all selected tactics", key="tactics_all")
         else:
             tactics_filter = None
 
 # Handle case when no file is uploaded
 if 'upload' not in st.session_state:
-    st.info("Upload an Excel file through the sidebar to begin.")
+    st.info("Upload an Excel file or an ATT&CK STIX bundle (e.g. enterprise-attack.json) through the sidebar to begin.")
+    finish_run()
     st.stop()
 
+# Apply Filters as one boolean mask over the sheet
+with stage("filter"):
+    mask = np.ones(len(df), dtype=bool)
 
-df_clean = df.replace(np.nan, 0)
-
-# Apply Filters
-df_filtered = df.copy()
+    if name_filter:
+        mask &= df["name"].str.contains(name_filter, case=False, na=False).to_numpy()
+    if domain_filter:
+        mask &= df["domain"].isin(domain_filter).to_numpy()
+    if platforms_filter:
+        # Rows listing any (or all) of the selected platforms, not only exact string matches
+        mask &= platforms_index.all_of(platforms_filter) if platforms_match_all else platforms_index.any_of(platforms_filter)
+    if tactics_filter:
+        mask &= tactics_index.all_of(tactics_filter) if tactics_match_all else tactics_index.any_of(tactics_filter)
 
-if name_filter:
-    df_filtered = df_filtered[df_filtered["name"].str.contains(name_filter, case=False, na=False)]
-if domain_filter:
-    df_filtered = df_filtered[df_filtered["domain"].isin(domain_filter)]
-if platforms_filter:
-    df_filtered = df_filtered[df_filtered["platforms"].isin(platforms_filter)]
-if tactics_filter:
-    df_filtered = df_filtered[df_filtered["tactics"].isin(tactics_filter)]
+    df_filtered = df[mask].copy()
+    positions = np.flatnonzero(mask)
+    filter_hash = hashlib.sha1(positions.tobytes()).hexdigest()
 
 # Data Preview
-with st.expander("Raw Data Preview"):
-    st.dataframe(df_filtered)
+with st.expander("Raw Data Preview"), stage("preview"):
+    # Only the visible page of the filtered rows is sent to the browser
+    paged_dataframe(dataset.preview_source(selected_sheet, df), key="raw_preview", rows=positions, rows_key=filter_hash)
+
+# Number of platform/tactic pairs of the filtered rows, memoized like the figures so reruns
+# with the same filters skip the grouping
+@st.cache_data(max_entries=64, show_spinner=False)
+def count_tactic_platform_pairs(dataset_key, sheet, filter_hash, _df):
+    return _df.groupby(['tactics', 'platforms']).ngroups
 
 # Visualization Section
-with st.expander("Interactive Visualizations"):
+with st.expander("Interactive Visualizations"), stage("visualizations"):
     st.header("Interactive Visualizations")
     if 'tactics' in df_filtered.columns:
-        # Group the data by tactics and platforms for the sunburst chart
-        tactics_platforms = df_filtered.groupby(['tactics', 'platforms']).size().reset_index(name='count')
+        with stage("aggregate"):
+            pair_count = count_tactic_platform_pairs(dataset.key, selected_sheet, filter_hash, df_filtered)
+        # Above the category limit the smaller platform/tactic pairs are grouped as "Other"
+        sunburst_all = show_all_categories("sunburst_all", pair_count)
 
         # Sunburst used to show the percentage of tactics used by each platforms 
-        fig_sunburst = px.sunburst(
-            tactics_platforms,
-            path=['platforms', 'tactics'],  
-            values='count',  #
-            title="Tactics Distribution by Platform",
-            color='count',  
-            color_continuous_scale=px.colors.sequential.RdBu,  
-            hover_data=['count']  
-        )
-        fig_sunburst.update_traces(textinfo='label+percent entry')  # Show both labels and percentages
-        st.plotly_chart(fig_sunburst)
+        def build_sunburst():
+            # Group the data by tactics and platforms for the sunburst chart
+            tactics_platforms = df_filtered.groupby(['tactics', 'platforms']).size().reset_index(name='count')
+            fig_sunburst = px.sunburst(
+                tactics_platforms if sunburst_all else cap_hierarchy(tactics_platforms, ['platforms', 'tactics'], 'count'),
+                path=['platforms', 'tactics'],  
+                values='count',  #
+                title="Tactics Distribution by Platform",
+                color='count',  
+                color_continuous_scale=px.colors.sequential.RdBu,  
+                hover_data=['count']  
+            )
+            fig_sunburst.update_traces(textinfo='label+percent entry')  # Show both labels and percentages
+            return fig_sunburst
+
+        # Figures are rebuilt only when the sheet or the filters change
+        figure_params = {"sheet": selected_sheet, "filter": filter_hash}
+        with stage("figure"):
+            fig_sunburst = cached_figure(dataset.key, "sunburst", dict(figure_params, all=sunburst_all, count=pair_count),
+                                         build_sunburst)
+        with stage("render"):
+            st.plotly_chart(fig_sunburst)
         # Heatmap of Tactics and Occurrences
         st.subheader("Tactic Heatmap")
-        tactic_matrix = df_filtered.pivot_table(index="tactics", values="name", aggfunc='count', fill_value=0)
-        fig_heatmap = px.imshow(
-            tactic_matrix,
-            title="Tactic Occurrence Heatmap",
-            labels={"x": "Names", "y": "Tactics", "color": "Count"},
-            aspect="auto"
-        )
-        st.plotly_chart(fig_heatmap)
+        heatmap_all = show_all_categories("heatmap_all", df_filtered["tactics"].nunique())
+
+        def build_heatmap():
+            tactic_matrix = df_filtered.pivot_table(index="tactics", values="name", aggfunc='count', fill_value=0)
+            if not heatmap_all:
+                tactic_matrix = cap_categories(tactic_matrix.reset_index(), "tactics", "name").set_index("tactics")
+            return px.imshow(
+                tactic_matrix,
+                title="Tactic Occurrence Heatmap",
+                labels={"x": "Names", "y": "Tactics", "color": "Count"},
+                aspect="auto"
+            )
+
+        with stage("figure"):
+            fig_heatmap = cached_figure(dataset.key, "tactic heatmap", dict(figure_params, all=heatmap_all), build_heatmap)
+        with stage("render"):
+            st.plotly_chart(fig_heatmap)
         
     else:
         st.info("The selected sheet does not contain a 'tactics' column for visualization.")
 
-with st.expander("TF-IDF Preview"):
+# Word cloud images are memoized by dataset, sheet, column and the hash of the filtered rows
+@st.cache_data(max_entries=64, show_spinner=False)
+def render_word_cloud(dataset_key, sheet, column, filter_hash, _word_weights):
+    wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(_word_weights)
+    return wordcloud.to_array()
+
+with st.expander("TF-IDF Preview"), stage("tfidf"):
     # TF-IDF Processing and Word Cloud
-    if 'name' in df_filtered.columns:
+    text_columns = [column for column in ['name', 'description'] if column in df_filtered.columns]
+    if text_columns:
         st.subheader("TF-IDF Word Cloud")
-
-        def remove_stopwords(text):
-            if not isinstance(text, str):
-                return ""
-            words = word_tokenize(text)
-            return ' '.join([word for word in words if word.lower() not in set(stopwords.words('english'))])
-
-        df_filtered['name_no_stopwords'] = df_filtered['name'].apply(remove_stopwords)
-
-        if df_filtered['name_no_stopwords'].str.strip().any():
-            tfidf_vectorizer = TfidfVectorizer()
-            tfidf_matrix = tfidf_vectorizer.fit_transform(df_filtered['name_no_stopwords'])
-
-            tfidf_totals = np.array(tfidf_matrix.sum(axis=0)).flatten()
-            feature_names = tfidf_vectorizer.get_feature_names_out()
-
-            word_weights = {feature_names[i]: tfidf_totals[i] for i in range(len(feature_names))}
-
-            wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(word_weights)
-
-            fig_wc, ax_wc = plt.subplots(figsize=(10, 5))
-            ax_wc.imshow(wordcloud, interpolation="bilinear")
-            ax_wc.axis('off')
-            st.pyplot(fig_wc)
+        text_column = st.selectbox("Text column", text_columns, key="tfidf_column")
+
+        # The corpus of the whole sheet is tokenized and fitted once, the filter selects rows
+        with stage("aggregate"):
+            corpus = dataset.corpus_model(selected_sheet, text_column)
+            word_weights = corpus.weights(positions)
+
+        if word_weights:
+            with stage("figure"):
+                image = render_word_cloud(dataset.key, selected_sheet, text_column, filter_hash, word_weights)
+            with stage("render"):
+                st.image(image)
         else:
-            st.info("No text available in the 'name' column after removing stopwords.")
+            st.info(f"No text available in the '{text_column}' column after removing stopwords.")
     else:
         st.info("The selected sheet does not contain a 'name' column for TF-IDF processing.")
 
 
-with st.expander("Group Techniques Comparison"):
-    # Load the relationship data
-    df_relationship = data_sheets['relationships']
-    
-    # Filter for group and technique relationships
-    group_tech_relationships = df_relationship[
-        ((df_relationship['source type'] == 'group') & (df_relationship['target type'] == 'technique')) |
-        ((df_relationship['target type'] == 'group') & (df_relationship['source type'] == 'technique'))
-    ]
+with st.expander("Group Techniques Comparison"), stage("group comparison"):
+    # Sparse group x technique matrix, built once per dataset
+    group_matrix = dataset.group_techniques()
 
     # Function to display combined binary heatmap for two selected groups
     def display_combined_group_techniques():
         st.header("Techniques Used by Group 1 and Group 2")
 
         # Extract unique group names
-        groups = group_tech_relationships['source name'].unique()
+        groups = group_matrix.rows
 
         # Select two groups for comparison
         selected_group_1 = st.selectbox("Select Group 1", groups, key="group_1")
         selected_group_2 = st.selectbox("Select Group 2", groups, key="group_2")
 
         if selected_group_1 and selected_group_2:
-            # Filter data for both selected groups
-            group_df_1 = group_tech_relationships[group_tech_relationships['source name'] == selected_group_1]
-            group_df_2 = group_tech_relationships[group_tech_relationships['source name'] == selected_group_2]
-
-            # Prepare binary data for both groups (1 if technique exists, otherwise 0)
-            group_technique_binary_1 = group_df_1[['source name', 'target name']].drop_duplicates()
-            group_technique_binary_1['used'] = 1
-
-            group_technique_binary_2 = group_df_2[['source name', 'target name']].drop_duplicates()
-            group_technique_binary_2['used'] = 1
-
-            # Pivot to get binary technique existence for both groups
-            group_technique_pivot_1 = group_technique_binary_1.pivot(index='target name', columns='source name', values='used').fillna(0)
-            group_technique_pivot_2 = group_technique_binary_2.pivot(index='target name', columns='source name', values='used').fillna(0)
-
-            # Combine the two group dataframes on top of each other for easier comparison
-            combined_techniques = group_technique_pivot_1.join(group_technique_pivot_2, how='outer', lsuffix='_1', rsuffix='_2').fillna(0)
+            # Binary technique usage of both groups (1 if technique exists, otherwise 0)
+            combined_techniques = group_matrix.used_techniques([selected_group_1, selected_group_2])
+            if selected_group_1 == selected_group_2:
+                combined_techniques.columns = [f"{selected_group_1}_1", f"{selected_group_2}_2"]
 
             # Create the combined heatmap
             fig = px.imshow(
@@ -250,10 +239,61 @@ with st.expander("Group Techniques Comparison"):
         else:
             st.error("Please select both Group 1 and Group 2 to view the comparison.")
 
-    # Call the function to display the combined heatmap
-    display_combined_group_techniques()
+    # Function to compare any number of groups through the sparse matrix
+    def display_multi_group_comparison():
+        st.header("Compare Multiple Groups")
 
-with st.expander("Attack Frequency"):
+        groups = group_matrix.rows
+        if st.checkbox("Select all groups", key="all_groups"):
+            selected_groups = groups
+        else:
+            selected_groups = st.multiselect("Select Groups", groups, key="groups_n")
+
+        if len(selected_groups) < 2:
+            st.info("Select at least two groups to compare.")
+            return
+
+        # Pairwise Jaccard similarity of the techniques used by the selected groups
+        similarity = group_matrix.jaccard(selected_groups)
+        fig = px.imshow(
+            similarity,
+            title="Technique Overlap (Jaccard Similarity)",
+            color_continuous_scale="Blues",
+            labels=dict(x="Groups", y="Groups", color="Jaccard"),
+            aspect="auto",
+            text_auto=".2f" if len(selected_groups) <= 10 else False
+        )
+        st.plotly_chart(fig)
+
+        common = group_matrix.common_techniques(selected_groups)
+        st.write(f"**{len(common)}** techniques are used by all {len(selected_groups)} selected groups.")
+        if common:
+            st.write(", ".join(common))
+
+        # ATT&CK Navigator layers of the selection, generated when a button is clicked
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Navigator layer of the selection", lambda: layer_json(dataset, 'group', selected_groups),
+                               file_name="groups_layer.json", mime="application/json", key="layer_groups", on_click="ignore")
+        with col2:
+            st.download_button(f"Navigator layers of each group ({len(selected_groups)}, zip)",
+                               lambda: layers_zip(dataset, 'group', selected_groups),
+                               file_name="group_layers.zip", mime="application/zip", key="layers_groups", on_click="ignore")
+
+        # Most similar groups to one group of the selection
+        reference_group = st.selectbox("Most similar groups to", selected_groups, key="similar_group")
+        top_k = st.slider("Number of similar groups", 1, 20, 5, key="similar_k")
+        only_selected = st.checkbox("Only among the selected groups", value=True, key="similar_selected")
+        st.dataframe(group_matrix.most_similar(reference_group, top_k, selected_groups if only_selected else None))
+
+    comparison_mode = st.radio("Comparison", ["Two groups", "Multiple groups"], horizontal=True, key="group_mode")
+    if comparison_mode == "Two groups":
+        # Call the function to display the combined heatmap
+        display_combined_group_techniques()
+    else:
+        display_multi_group_comparison()
+
+with st.expander("Attack Frequency"), stage("attack frequency"):
     # Error check
     df_relationship = data_sheets.get('relationships', None)
 
@@ -261,29 +301,30 @@ with st.expander("Attack Frequency"):
         st.subheader("Frequency of Target Names")
 
         # Sort by target type selection
-        target_types = df_relationship["target type"].unique()
+        target_types = dataset.relationship_index().values("target type")
         selected_target_type = st.selectbox("Filter by Target Type:", options=target_types)
 
-        # Filter the dataframe based on selected target type
-        filtered_df = df_relationship[df_relationship["target type"] == selected_target_type]
-
-        # Count the frequency of each target name
-        target_name_count = filtered_df["target name"].value_counts().reset_index()
-        target_name_count.columns = ["Target Name", "Count"]
+        # Count the frequency of each target name from the aggregates of the dataset
+        target_name_count = dataset.aggregates().counts(target_type=selected_target_type, column="target name",
+                                                        name_label="Target Name", count_label="Count")
 
         # Pie chart for target name frequencies
-        fig_target_pie = px.pie(
-            target_name_count,
-            values="Count",
-            names="Target Name",
-            title=f"Frequency of Target Names in Attacks (Filtered by {selected_target_type})",
-            hover_data=["Count"],
-            color_discrete_sequence=px.colors.sequential.Blues,  # Custom color scheme
-            hole=0.3  # Donut chart style for better clarity
-        )
+        # Above the category limit the long tail of targets is one "Other" slice
+        frequency_all = show_all_categories("frequency_all", len(target_name_count))
+        with stage("figure"):
+            fig_target_pie = px.pie(
+                target_name_count if frequency_all else cap_categories(target_name_count, "Target Name", "Count"),
+                values="Count",
+                names="Target Name",
+                title=f"Frequency of Target Names in Attacks (Filtered by {selected_target_type})",
+                hover_data=["Count"],
+                color_discrete_sequence=px.colors.sequential.Blues,  # Custom color scheme
+                hole=0.3  # Donut chart style for better clarity
+            )
 
-        fig_target_pie.update_traces(textinfo="percent+label", showlegend=True)
-        st.plotly_chart(fig_target_pie)
+            fig_target_pie.update_traces(textinfo="percent+label", showlegend=True)
+        with stage("render"):
+            st.plotly_chart(fig_target_pie)
 
         # Display the most frequent targets below the pie chart
         st.subheader("Top Targeted Entities")
@@ -294,4 +335,38 @@ with st.expander("Attack Frequency"):
             st.write(f"**{i+1}. {row['Target Name']}** - {row['Count']} occurrences")
         
     else:
-        st.info("The relationships sheet, 'target name' column, or 'target type' column is missing for visualization.")
\ No newline at end of file
+        st.info("The relationships sheet, 'target name' column, or 'target type' column is missing for visualization.")
+
+with st.expander("Release Diff"), stage("release diff"):
+    # Compare the loaded data with another ATT&CK release by stable ID
+    other_upload = st.file_uploader("Choose the release to compare with", type=["xlsx", "xls", "json"], key="diff_upload")
+
+    if other_upload is not None:
+        other = open_comparison(other_upload)
+        if other.key == dataset.key:
+            st.info("Both files contain the same data.")
+        else:
+            release_diff = ReleaseDiff(dataset, other)
+            st.dataframe(release_diff.summary(), hide_index=True)
+
+            diff_sheet = st.selectbox("Sheet", options=list(release_diff.sheets), key="diff_sheet")
+            sheet_diff = release_diff[diff_sheet]
+            if sheet_diff.empty():
+                st.info(f"No differences in {diff_sheet}.")
+            else:
+                st.write(f"Added {diff_sheet}")
+                st.dataframe(sheet_diff.added)
+                st.write(f"Removed {diff_sheet}")
+                st.dataframe(sheet_diff.removed)
+                st.write(f"Changed {diff_sheet}")
+                st.dataframe(sheet_diff.changed_columns())
+
+            # Switch the session to the other release, reusing what was computed for this one
+            if st.button("Switch to this release"):
+                release_diff.carry_over()
+                switch_to_comparison()
+                st.session_state['upload'] = other_upload
+                finish_run()
+                st.rerun()
+
+finish_run()
@@ -1,6 +1,12 @@
-import pandas as pd
 import streamlit as st
 import plotly.express as px
+from attack_data import trends
+from attack_data.figures import (cached_figure, cached_figures, cap_categories, cap_columns, render_mode,
+                                 show_all_categories)
+from attack_data.navigator import layer_json, layers_zip
+from attack_data.preview import paged_dataframe
+from attack_data.profiling import finish_run, stage, start_run
+from attack_data.session import current_dataset
 
 # Set the page configuration
 st.set_page_config(
@@ -11,25 +17,39 @@ st.set_page_config(
 # Title of the app
 st.title("MITRE ATT&CK DATA")
 
-# Access the relationship data from session_state
-if 'relationship_df' in st.session_state and 'campaigns_df' in st.session_state and 'techniques_df' in st.session_state and 'software_df' in st.session_state:
-    df = st.session_state['relationship_df']
+# Time the stages of this run for the profiling panel and the metrics file
+start_run("Trends")
+
+# Access the relationship data from the dataset shared between sessions
+with stage("load"):
+    dataset = current_dataset()
+    if dataset is not None and all(name in dataset.sheets for name in ['relationships', 'campaigns', 'techniques', 'software']):
+        df = dataset.sheets['relationships']
     
-    df_techniques = df[(df['mapping type'] == 'uses') & (df['target type'] == 'technique')]
-    df_software = df[(df['mapping type'] == 'uses') & (df['target type'] == 'software')]
-    df_detection = df[(df['mapping type'] == 'detects') & (df['target type'] == 'technique')]
-    df_mitigation = df[(df['mapping type'] == 'mitigates') & (df['target type'] == 'technique')]
-    df_attribute_to =df[(df['mapping type'] == 'attributed-to') & (df['target type'] == 'group')]
+        # Slices come from the index built once per dataset instead of boolean masks on every rerun
+        relationships = dataset.relationship_index()
+        df_techniques = relationships.slice('uses', 'technique')
+        df_software = relationships.slice('uses', 'software')
+        df_detection = relationships.slice('detects', 'technique')
+        df_mitigation = relationships.slice('mitigates', 'technique')
+        df_attribute_to = relationships.slice('attributed-to', 'group')
+
+        # Name counts of every slice, materialized once per dataset
+        aggregates = dataset.aggregates()
+
+        # Campaign dates are parsed once per dataset, the views only query the timeline
+        timeline = dataset.campaign_timeline()
+        # combined_campaigns_ = pd.concat(df_techniques.value(), ignore_index=True)
+    else:
+        st.info("Please upload an excel file in the Data Filter page to see visualisations")
+        finish_run()
+        st.stop()
 
-    df_campaigns = st.session_state['campaigns_df']
-    df_techniques_sheet = st.session_state['techniques_df']
-    df_software_sheet = st.session_state['software_df']
-    # combined_campaigns_ = pd.concat(df_techniques.value(), ignore_index=True)
-else:
-    st.info("Please upload an excel file in the Data Filter page to see visualisations")
-    st.stop()
 
 
+# Paged preview of a relationship slice, only the visible page is sent to the browser
+def display_data_preview(df, view):
+    paged_dataframe(dataset.preview_source(f"relationships:{view}", df), key=f"preview_{view}")
 
     # Function to display visualizations for techniques
 def display_techniques_visualization(df):
@@ -37,108 +57,68 @@ def display_techniques_visualization(df):
     
     
     # Data Preview
-    with st.expander("Data Preview"):
-        st.dataframe(df)
+    with st.expander("Data Preview"), stage("preview"):
+        display_data_preview(df, "techniques")
 
     if 'target name' in df.columns:
         min_count = st.slider('Minimum Usage Count:', 0, 200, 100)
-        technique_counts = df['target name'].value_counts().reset_index()
-        technique_counts.columns = ['Technique', 'Usage Count']
-        technique_counts = technique_counts[technique_counts['Usage Count'] >= min_count]
+        technique_counts = trends.technique_counts(dataset, min_count)
 
         if not technique_counts.empty:
-            fig = px.bar(technique_counts, x='Technique', y='Usage Count',
-                         title=f'Most Used Techniques in MITRE ATT&CK ({min_count}+ Uses)',
-                         labels={'Usage Count': 'Number of Uses', 'Technique': 'Techniques'},
-                         color='Usage Count', color_continuous_scale=px.colors.sequential.Viridis)
-
-            fig.update_layout(width=1000, height=800)
-            st.plotly_chart(fig)
+            # Low thresholds give hundreds of bars, the smallest are grouped as "Other" unless asked for
+            if not show_all_categories('techniques_all', len(technique_counts)):
+                technique_counts = cap_categories(technique_counts, 'Technique', 'Usage Count')
+            st.plotly_chart(trends.techniques_figure(technique_counts, min_count))
         else:
             st.warning(f"No techniques with {min_count} or more uses found.")
 
 def display_mitigation_visualization(df):
-    with st.expander("Data Preview"):
-        st.dataframe(df)
+    with st.expander("Data Preview"), stage("preview"):
+        display_data_preview(df, "mitigation")
 
 # Function to display visualizations for software
 def display_software_visualization(df):
    
-    with st.expander("Data Preview"):
-        st.dataframe(df)
+    with st.expander("Data Preview"), stage("preview"):
+        display_data_preview(df, "software")
 
     if 'target name' in df.columns:
         min_count = st.slider('Minimum Usage Count:', 0, 100, 10)
-        software_counts = df['target name'].value_counts().reset_index()
-        software_counts.columns = ['Software', 'Usage Count']
-        software_counts = software_counts[software_counts['Usage Count'] > min_count]
+        software_counts = trends.software_counts(dataset, min_count)
 
         if not software_counts.empty:
-            fig = px.pie(software_counts, names='Software', values='Usage Count',
-                         title='Most Used Software in MITRE ATT&CK ({min_count}+)',
-                         color='Software', color_discrete_sequence=px.colors.sequential.Viridis)
-
-            fig.update_layout(width=800, height=800)
-            st.plotly_chart(fig)
-             # Step 1: Merge with software sheet to get platforms
-            merged_data = software_counts.merge(df_software_sheet[['name', 'platforms']],
-                                                 left_on='Software', right_on='name', how='left')
+            st.plotly_chart(trends.software_figure(software_counts, min_count))
 
-            # Step 2: Explode platforms to separate rows if multiple platforms are listed
-            merged_data['platforms'] = merged_data['platforms'].str.split(', ')
-            merged_data = merged_data.explode('platforms')
-
-            # Step 3: Group by platform and sum usage counts
-            platform_usage = merged_data.groupby('platforms')['Usage Count'].sum().reset_index()
-
-
-            # Step 5: Create a bar chart to visualize the same data
+            # Usage summed per platform of the software sheet
+            platform_usage = trends.software_platform_usage(dataset, software_counts)
             if not platform_usage.empty:
-                bar_fig = px.bar(platform_usage, x='platforms', y='Usage Count',
-                                 title='Total Software Usage per Platform',
-                                 labels={'platforms': 'Platform', 'Usage Count': 'Total Usage Count'},
-                                 color='Usage Count', color_continuous_scale=px.colors.sequential.Viridis)
-
-                bar_fig.update_layout(width=800, height=600)
-                st.plotly_chart(bar_fig)
+                st.plotly_chart(trends.platform_usage_figure(platform_usage))
             else:
                 st.warning("No platforms found for the software.")
         else:
-            st.warning("No software with {min_count} or more uses found.")
+            st.warning(f"No software with {min_count} or more uses found.")
 
 
 
-def display_detection_visualization(df, source_name, source_type, mapping_type, chart_title):
+def display_detection_visualization(df, source_name, source_type, mapping_type, chart_title, relationship_type):
      # Data Preview
-    with st.expander("Data Preview"):
-        st.dataframe(df)
+    with st.expander("Data Preview"), stage("preview"):
+        display_data_preview(df, relationship_type)
 
     if 'target name' in df.columns and 'source name' in df.columns:
-        component_counts = df['source name'].value_counts().reset_index()
-        component_counts.columns = [f'{source_name}', f'{chart_title} Count']
-        component_counts = component_counts[component_counts[f'{chart_title} Count'] > 20]
+        component_counts = trends.source_counts(dataset, relationship_type, source_name, chart_title)
 
         if not component_counts.empty:
-            fig = px.bar(component_counts, x=f'{source_name}', y=f'{chart_title} Count',
-                          title=f'Most Used {source_type} to {mapping_type} Techniques (20+ usage)',
-                          labels={f'{chart_title} Count': f'{chart_title} Count',f'{source_name}':f'{source_name}'},
-                          color=f'{chart_title} Count', color_continuous_scale=px.colors.sequential.Plasma)
-
-            st.plotly_chart(fig)
+            st.plotly_chart(trends.source_figure(component_counts, source_name, source_type, mapping_type, chart_title))
         else:
             st.warning("No f'{source_name}'s found.")
 
-        technique_counts = df['target name'].value_counts().reset_index()
-        technique_counts.columns = ['Technique', 'Technique Count']
-        component_counts = component_counts.merge(technique_counts, how='left', left_on=f'{source_name}', right_on='Technique')
-        component_counts['Technique Count'] = component_counts['Technique Count'].fillna(0)
+        component_counts = trends.bubble_table(dataset, relationship_type, component_counts, source_name)
 
         if not component_counts.empty:
-            fig = px.scatter(component_counts, x=f'{chart_title} Count', y='Technique Count',
-                              size=f'{chart_title} Count', color=f'{source_name}',
-                              hover_name=f'{source_name}', title=f'Bubble Chart of {source_type} Components',
-                              labels={f'{chart_title} Count': f'{chart_title} Count', 'Technique Count': 'Number of Associated Techniques'},
-                              size_max=60, template='plotly')
+            # The bubble chart only depends on the dataset and the relationship type
+            fig = cached_figure(dataset.key, "bubble chart", {"relationship_type": relationship_type}, lambda: trends.bubble_figure(
+                component_counts, source_name, source_type, chart_title, render_mode(len(component_counts))))
 
             st.plotly_chart(fig)
         else:
@@ -148,105 +128,115 @@ def display_detection_visualization(df, source_name, source_type, mapping_type,
 
 
 
-def display_campaign_techniques(df):
-    # Filter only campaigns
-    campaigns = df[df['source type'] == 'campaign']['source name'].unique()
-    
-    # Allow the user to select two campaigns for comparison
-    selected_campaigns = st.multiselect("Select up to 2 Campaigns", campaigns, max_selections=2)
-    
-    if len(selected_campaigns) == 1 or len(selected_campaigns) == 2:
-        # Create two columns for side-by-side comparison if two campaigns are selected
-        if len(selected_campaigns) == 2:
-            col1, col2 = st.columns(2)
-        else:
-            col1, col2 = st.columns([1, 0.1])  # Single column for one campaign, second column hidden
-            
-        for idx, campaign in enumerate(selected_campaigns):
-            # Filter data for the selected campaign
-            filtered_data = df[df['source name'] == campaign]
-
-            if 'target name' in filtered_data.columns:
-                technique_counts = filtered_data['target name'].value_counts().reset_index()
-                technique_counts.columns = ['Technique', 'Usage Count']
-
-                if not technique_counts.empty:
-                    fig = px.pie(technique_counts, names='Technique', values='Usage Count',
-                                 title=f'Techniques Used by {campaign}',
-                                 color='Technique', color_discrete_sequence=px.colors.sequential.Plasma)
-
-                    fig.update_layout(width=500, height=500)
-
-                    # Display pie charts in separate columns
-                    if idx == 0:
-                        with col1:
-                            st.subheader(f"Techniques used by {campaign}")
-                            st.plotly_chart(fig)
-                    elif idx == 1:
-                        with col2:
-                            st.subheader(f"Techniques used by {campaign}")
-                            st.plotly_chart(fig)
+# Charts per row of the campaign small multiples
+CAMPAIGN_COLUMNS = 3
+
+
+# Compare any number of campaigns, one chart per campaign or all of them in one matrix
+def display_campaign_comparison(label, view, matrix, counts, build_figure):
+    campaigns = trends.campaign_names(dataset)
+    selected_campaigns = st.multiselect("Select Campaigns", campaigns, key=f"{view}_selection")
+    if not selected_campaigns:
+        st.warning(f"Please select one or more campaigns to display {label}.")
+        return selected_campaigns
+
+    layout = st.radio("Layout", ["Small multiples", "Matrix"], horizontal=True, key=f"{view}_layout")
+    if layout == "Matrix":
+        table = matrix.frame(selected_campaigns)
+        if table.empty:
+            st.warning(f"No {label} found for the selected campaigns.")
+            return
+        if not show_all_categories(f"{view}_matrix_all", table.shape[1]):
+            table = cap_columns(table)
+        params = {"campaigns": sorted(selected_campaigns), "columns": list(table.columns)}
+        fig = cached_figure(dataset.key, f"{view} matrix", params,
+                            lambda: trends.campaign_matrix_figure(table, label.title()))
+        st.plotly_chart(fig)
+        return selected_campaigns
+
+    # Figures missing from the cache are built in parallel, then laid out in rows
+    tables = {campaign: counts(dataset, campaign) for campaign in selected_campaigns}
+    charted = [campaign for campaign in selected_campaigns if not tables[campaign].empty]
+    figures = dict(zip(charted, cached_figures(dataset.key, view, [
+        ({"campaign": campaign}, lambda campaign=campaign: build_figure(tables[campaign], campaign))
+        for campaign in charted])))
+
+    for start in range(0, len(selected_campaigns), CAMPAIGN_COLUMNS):
+        columns = st.columns(CAMPAIGN_COLUMNS)
+        for column, campaign in zip(columns, selected_campaigns[start:start + CAMPAIGN_COLUMNS]):
+            with column:
+                if campaign in figures:
+                    st.subheader(f"{label.title()} used by {campaign}")
+                    st.plotly_chart(figures[campaign])
                 else:
-                    st.warning(f"No techniques found for the campaign: {campaign}")
-            else:
-                st.warning("Target name column not found in the dataset.")
+                    st.warning(f"No {label} found for the campaign: {campaign}")
+    return selected_campaigns
+
+
+# Techniques used by a threat profile of groups that nothing detects or mitigates
+def display_coverage_gaps(relationship_type, label):
+    st.subheader("Coverage Gaps")
+    coverage = dataset.coverage()
+    groups = st.multiselect("Threat Profile (groups targeting you)", coverage.groups,
+                            key=f"coverage_{relationship_type}_groups")
+    if groups:
+        profile = coverage.profile(groups)
+        gaps = coverage.gaps(groups, relationship_type)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Techniques Used", len(profile))
+        col2.metric(label, len(profile) - len(gaps))
+        col3.metric(f"Not {label}", len(gaps))
+        if not gaps.empty:
+            st.dataframe(gaps, hide_index=True)
+        else:
+            st.success(f"Every technique used by the selected groups is {label.lower()}.")
     else:
-        st.warning("Please select one or two campaigns to display data.")
+        st.info(f"Select groups to list the techniques they use that are not {label.lower()}.")
 
+    # Every group at once, the groups with the most uncovered techniques first
+    coverage_table = trends.coverage_table(dataset, label)
+    fig = cached_figure(dataset.key, "coverage", {"relationship_type": relationship_type},
+                        lambda: trends.coverage_figure(coverage_table, label))
+    st.plotly_chart(fig)
+    with st.expander("Coverage of All Groups"):
+        st.dataframe(coverage_table, hide_index=True)
 
 
-def display_campaign_group(df):
-    group_counts = df_attribute_to.groupby('target name')['source name'].count().reset_index()
-    group_counts.columns = ['Group', 'Campaign Count']
-
-    # Sort the counts in descending order to see the most active groups first
-    group_counts = group_counts.sort_values(by='Campaign Count', ascending=False)
-
-    # Bar chart of most active groups
-    fig = px.bar(group_counts, x='Group', y='Campaign Count',
-                title='Most Active Groups in MITRE ATT&CK by Campaigns',
-                labels={'Campaign Count': 'Number of Campaigns', 'Group': 'Groups'},
-                color='Campaign Count', color_continuous_scale=px.colors.sequential.Plasma)
+def display_campaign_techniques(df):
+    if 'target name' not in df.columns:
+        st.warning("Target name column not found in the dataset.")
+        return
+    selected_campaigns = display_campaign_comparison("techniques", "campaign techniques", dataset.campaign_analytics().techniques,
+                                                     trends.campaign_technique_counts, trends.campaign_techniques_figure)
 
-    # Display chart in Streamlit
-    st.plotly_chart(fig)
+    # ATT&CK Navigator layers of the selected campaigns, generated when a button is clicked
+    if selected_campaigns:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Navigator layer of the selection", lambda: layer_json(dataset, 'campaign', selected_campaigns),
+                               file_name="campaigns_layer.json", mime="application/json", key="layer_campaigns", on_click="ignore")
+        with col2:
+            st.download_button(f"Navigator layers of each campaign ({len(selected_campaigns)}, zip)",
+                               lambda: layers_zip(dataset, 'campaign', selected_campaigns),
+                               file_name="campaign_layers.zip", mime="application/zip", key="layers_campaigns", on_click="ignore")
 
-# Function to display line chart of campaigns over time
-def display_campaigns_line_chart(df_campaigns):
-    # Ensure the 'first seen' and 'last seen' columns are in datetime format
-    df_campaigns['first seen'] = pd.to_datetime(df_campaigns['first seen'], errors='coerce')
-    df_campaigns['last seen'] = pd.to_datetime(df_campaigns['last seen'], errors='coerce')
-
-    # Create a DataFrame for the number of campaigns per year
-    df_campaigns['year'] = df_campaigns['first seen'].dt.year
-    campaign_counts = df_campaigns['year'].value_counts().reset_index()
-    campaign_counts.columns = ['Year', 'Campaign Count']
-    campaign_counts = campaign_counts.sort_values(by='Year')
-
-    # Plotting the line chart
-    fig = px.line(campaign_counts, x='Year', y='Campaign Count',
-                  title='Number of Campaigns Detected Over Time',
-                  labels={'Year': 'Year', 'Campaign Count': 'Number of Campaigns'},
-                  markers=True)
-    st.plotly_chart(fig)
-def display_campaigns_by_year(df_campaigns):
-    # Ensure the 'first seen' column is in datetime format
-    df_campaigns['first seen'] = pd.to_datetime(df_campaigns['first seen'], errors='coerce')
 
-    # Extract the year from 'first seen'
-    df_campaigns['year'] = df_campaigns['first seen'].dt.year
 
-    # Remove any rows where 'year' is NaN (invalid 'first seen' values)
-    df_campaigns = df_campaigns.dropna(subset=['year'])
+def display_campaign_group(df):
+    # Campaign counts per group, already sorted with the most active groups first
+    group_counts = trends.campaign_group_counts(dataset)
 
-    # Group by year and aggregate campaigns, and count the campaigns per year
-    campaigns_by_year = df_campaigns.groupby('year').agg(
-        Campaigns=('name', list),  # Aggregating campaigns into a list
-        Count=('name', 'count')    # Counting the number of campaigns per year
-    ).reset_index()
+    # Bar chart of most active groups
+    st.plotly_chart(trends.campaign_group_figure(group_counts))
 
-    # Sort the data by year for a better chronological view
-    campaigns_by_year = campaigns_by_year.sort_values('year', ascending=False)
+# Function to display line chart of campaigns over time
+def display_campaigns_line_chart():
+    # Number of campaigns per first seen year
+    campaign_counts = trends.campaigns_per_year(dataset)
+    st.plotly_chart(trends.campaigns_per_year_figure(campaign_counts))
+def display_campaigns_by_year():
+    # Campaign names and counts per year, latest first
+    campaigns_by_year = trends.campaigns_by_year(dataset)
 
     # Displaying the campaigns in a table format with campaign count and list of campaigns
     st.subheader("Campaigns by Year")
@@ -255,91 +245,89 @@ def display_campaigns_by_year(df_campaigns):
     styled_table = campaigns_by_year.style.highlight_max(subset=['Count'], color='red', axis=0)
      # Display the table with a specific width and height
     st.dataframe(styled_table, use_container_width=500, height=500)
-def display_campaign_scatter_plot(df_campaigns, df_techniques):
-    # Ensure 'first seen' and 'last seen' are in datetime format
-    df_campaigns['first seen'] = pd.to_datetime(df_campaigns['first seen'], errors='coerce')
-    df_campaigns['last seen'] = pd.to_datetime(df_campaigns['last seen'], errors='coerce')
-
-    # Calculate duration in days
-    df_campaigns['duration'] = (df_campaigns['last seen'] - df_campaigns['first seen']).dt.days
-
-    # Count techniques per campaign
-    techniques_count = df_techniques.groupby('source name')['target name'].nunique().reset_index()
-    techniques_count.columns = ['Campaign Name', 'Techniques Count']
-
-    # Merge campaign duration and techniques count
-    campaign_data = df_campaigns.merge(techniques_count, left_on='name', right_on='Campaign Name', how='left')
-
-    # Fill NaN values in 'Techniques Count' with 0 for sizing
-    campaign_data['Techniques Count'] = campaign_data['Techniques Count'].fillna(0)
-
-    # Create scatter plot
-    fig = px.scatter(campaign_data, x='Techniques Count', y='duration',
-                     title='Campaign Duration vs. Techniques Count',
-                     labels={'duration': 'Duration (days)', 'Techniques Count': 'Number of Techniques'},
-                     hover_name='name', size='duration', color='name', size_max= 25,
-                     template='plotly')
-
+def display_campaign_scatter_plot():
+    def build_figure():
+        # Duration against the number of techniques of every campaign
+        campaign_data = trends.campaign_durations(dataset)
+        return trends.campaign_scatter_figure(campaign_data, render_mode(len(campaign_data)))
+
+    # The scatter plot only depends on the dataset
+    fig = cached_figure(dataset.key, "campaign scatter", None, build_figure)
     st.plotly_chart(fig)
-def display_campaigns_tactics_visualization(df_techniques, df_techniques_sheet): 
-    # Step 1: Map techniques to their tactics
-    technique_to_tactic = df_techniques_sheet[['ID', 'tactics']].rename(columns={'ID': 'target ID'})
-
-    # Step 2: Merge techniques with their tactics
-    techniques_with_tactics = df_techniques.merge(technique_to_tactic, on='target ID', how='left')
 
-    # Filter only campaigns
-    campaigns = df_techniques[df_techniques['source type'] == 'campaign']['source name'].unique()
+# Function to display the campaigns active in a time window and the overlaps per group
+def display_campaign_timeline():
+    st.subheader("Campaign Timeline")
+    start, end = timeline.start(), timeline.end()
+    if start is None:
+        st.warning("No campaign dates found in the dataset.")
+        return
+
+    window = st.slider("Active between", min_value=start.date(), max_value=end.date(),
+                       value=(start.date(), end.date()), format="MMM YYYY", key="timeline_window")
+    active = timeline.active(*window)
+    if not active.empty:
+        # Built directly, a graph_objects figure is cheaper to build than to read back from JSON
+        st.plotly_chart(trends.campaign_gantt_figure(active))
+    else:
+        st.warning("No campaigns active in the selected window.")
 
-    # Step 3: Campaign selection
-    selected_campaigns = st.multiselect("Select up to 2 Campaigns", campaigns, max_selections=2)
+    fig = cached_figure(dataset.key, "campaign activity", None,
+                        lambda: trends.monthly_activity_figure(timeline.monthly_activity()))
+    st.plotly_chart(fig)
 
-    if len(selected_campaigns) == 1 or len(selected_campaigns) == 2:
-        # Create two columns for side-by-side comparison if two campaigns are selected
-        if len(selected_campaigns) == 2:
-            col1, col2 = st.columns(2)
-        else:
-            col1, col2 = st.columns([1, 0.1])  # Single column for one campaign, second column hidden
-
-        for idx, campaign in enumerate(selected_campaigns):
-            # Step 4: Filter for the selected campaign
-            filtered_tactics = techniques_with_tactics[techniques_with_tactics['source name'] == campaign]
-            campaigns_tactics = filtered_tactics[['source name', 'tactics']].dropna()
-
-            # Group tactics by the selected campaign
-            tactics_per_campaign = campaigns_tactics.groupby('tactics')['source name'].count().reset_index()
-            tactics_per_campaign.columns = ['Tactics', 'Campaign Count']
-
-            # Step 5: Create a pie chart to visualize tactics used by the selected campaign
-            if not tactics_per_campaign.empty:
-                fig = px.pie(tactics_per_campaign, names='Tactics', values='Campaign Count',
-                             title=f'Tactics Used by {campaign}',
-                             labels={'Tactics': 'Tactics', 'Campaign Count': 'Number of Campaigns'},
-                             color='Tactics', color_discrete_sequence=px.colors.sequential.Viridis)
-
-                fig.update_traces(textinfo='percent+label')
-                fig.update_layout(width=500, height=500)
-
-                # Display pie charts in separate columns
-                if idx == 0:
-                    with col1:
-                        st.subheader(f"Tactics used by {campaign}")
-                        st.plotly_chart(fig)
-                elif idx == 1:
-                    with col2:
-                        st.subheader(f"Tactics used by {campaign}")
-                        st.plotly_chart(fig)
-            else:
-                st.warning(f"No tactics found for the campaign: {campaign}")
+    # Campaigns of the same group active at the same time
+    groups = sorted(timeline.attributions['group'].unique())
+    group = st.selectbox("Overlapping campaigns of", ["All groups"] + groups, key="timeline_group")
+    overlapping = timeline.overlapping(None if group == "All groups" else group)
+    if not overlapping.empty:
+        st.dataframe(overlapping, hide_index=True)
+    else:
+        st.info("No overlapping campaigns found.")
+
+def display_campaigns_tactics_visualization():
+    display_campaign_comparison("tactics", "campaign tactics", dataset.campaign_analytics().tactics,
+                                trends.campaign_tactic_counts, trends.campaign_tactics_figure)
+
+# Function to display centrality and mitigation coverage from the knowledge graph
+def display_graph_analytics():
+    graph = dataset.graph()
+    st.write(f"{len(graph)} objects connected by {graph.edge_count()} relationships")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        node_type = st.selectbox("Object Type", ['technique', 'group', 'software'], key='graph_type')
+    with col2:
+        metric = st.selectbox("Measure", ['pagerank', 'betweenness', 'degree'], key='graph_metric')
+
+    top_nodes = graph.top_nodes(node_type, metric, k=20)
+    if not top_nodes.empty:
+        fig = px.bar(top_nodes, x='name', y=metric, hover_data=['ID', 'in degree', 'out degree'],
+                     title=f'Most Central {node_type.title()} Objects by {metric.title()}',
+                     labels={'name': node_type.title(), metric: metric.title()},
+                     color=metric, color_continuous_scale=px.colors.sequential.Viridis)
+        st.plotly_chart(fig)
     else:
-        st.warning("Please select one or two campaigns to display tactics.")
+        st.warning(f"No {node_type} objects found in the relationships.")
+
+    # Which mitigations cover the most techniques used by a group
+    group = st.selectbox("Group", graph.names('group'), key='graph_group')
+    if group:
+        coverage = graph.mitigations_for(group, 'group', k=20)
+        if not coverage.empty:
+            fig = px.bar(coverage, x='Name', y='Techniques Covered', hover_data=['ID', 'Coverage'],
+                         title=f'Mitigations Covering the Most Techniques Used by {group}',
+                         color='Coverage', color_continuous_scale=px.colors.sequential.Plasma)
+            st.plotly_chart(fig)
+        else:
+            st.warning(f"No mitigations found for the techniques used by {group}.")
 
 # Session state to track the current page
 if 'page' not in st.session_state:  
     st.session_state.page = "Techniques"
 
 # Create buttons for navigation
-col1, col2, col3, col4, col5 = st.columns(5)
+col1, col2, col3, col4, col5, col6 = st.columns(6)
 
 with col1:
     if st.button("Most Used Techniques"):
@@ -359,31 +347,44 @@ with col4:
 with col5:
     if st.button("Campaign"):
         st.session_state.page = "Attribute"
-
-# Display the appropriate page based on the session state
-if st.session_state.page == "Techniques":
-    st.subheader("Most Used Techniques")
-    display_techniques_visualization(df_techniques)
-    display_campaign_techniques(df_techniques)  # Updated function for comparing techniques
+with col6:
+    if st.button("Knowledge Graph"):
+        st.session_state.page = "Graph"
+
+# Display the appropriate page based on the session state, timed per view
+with stage(st.session_state.page.lower()):
+    if st.session_state.page == "Techniques":
+        st.subheader("Most Used Techniques")
+        display_techniques_visualization(df_techniques)
+        display_campaign_techniques(df_techniques)  # Updated function for comparing techniques
     
-elif st.session_state.page == "Software":
-    st.subheader("Most Used Software")
-    display_software_visualization(df_software)
+    elif st.session_state.page == "Software":
+        st.subheader("Most Used Software")
+        display_software_visualization(df_software)
 
-elif st.session_state.page == "Detection":
-    st.subheader("Detections")
+    elif st.session_state.page == "Detection":
+        st.subheader("Detections")
   
-    display_detection_visualization(df_detection, source_name="Data Components", source_type="Data Components", mapping_type ="Detect", chart_title="Detection")
+        display_detection_visualization(df_detection, source_name="Data Components", source_type="Data Components", mapping_type ="Detect", chart_title="Detection", relationship_type="detects")
+        display_coverage_gaps("detects", "Detected")
  
-elif st.session_state.page == "Mitigation":
-    st.subheader("Mitigation")
-    display_detection_visualization(df_mitigation, source_name="Mitigation Methods", source_type="Mitigation Methods", mapping_type="Mitigate", chart_title="Mitigation")
-
-elif st.session_state.page == "Attribute":
-    st.subheader("Campaign Visualisations")
-
-    display_campaign_group(df)                   
-    display_campaigns_line_chart(df_campaigns)
-    display_campaigns_by_year(df_campaigns)
-    display_campaign_scatter_plot(df_campaigns, df_techniques)
-    display_campaigns_tactics_visualization( df_techniques, df_techniques_sheet)
\ No newline at end of file
+    elif st.session_state.page == "Mitigation":
+        st.subheader("Mitigation")
+        display_detection_visualization(df_mitigation, source_name="Mitigation Methods", source_type="Mitigation Methods", mapping_type="Mitigate", chart_title="Mitigation", relationship_type="mitigates")
+        display_coverage_gaps("mitigates", "Mitigated")
+
+    elif st.session_state.page == "Attribute":
+        st.subheader("Campaign Visualisations")
+
+        display_campaign_group(df)                   
+        display_campaigns_line_chart()
+        display_campaigns_by_year()
+        display_campaign_scatter_plot()
+        display_campaign_timeline()
+        display_campaigns_tactics_visualization()
+
+    elif st.session_state.page == "Graph":
+        st.subheader("Knowledge Graph")
+        display_graph_analytics()
+
+finish_run()
@@ -0,0 +1,52 @@
+import time
+
+import streamlit as st
+from attack_data.profiling import finish_run, stage, start_run
+from attack_data.search import SEARCH_SHEETS
+from attack_data.session import current_dataset
+
+# Set the page configuration
+st.set_page_config(
+    page_title="MITRE ATT&CK Search",
+    layout="wide",
+)
+
+st.title("Search MITRE ATT&CK")
+
+# Time the stages of this run for the profiling panel and the metrics file
+start_run("Search")
+
+with stage("load"):
+    dataset = current_dataset()
+    if dataset is None:
+        st.info("Please upload an excel file in the Data Filter page to search it")
+        finish_run()
+        st.stop()
+    # Read from the cache directory after the first search of this workbook
+    index = dataset.search_index()
+
+col1, col2, col3 = st.columns([4, 2, 1])
+with col1:
+    query = st.text_input("Search names, descriptions and IDs (e.g. T1059.001, powershell, spearphish)",
+                          key="search_query")
+with col2:
+    sheets = st.multiselect("Sheets", SEARCH_SHEETS, default=SEARCH_SHEETS, key="search_sheets")
+with col3:
+    limit = st.selectbox("Results", [25, 50, 100, 250], index=1, key="search_limit")
+
+if query.strip():
+    with stage("search"):
+        start = time.perf_counter()
+        results = index.search(query, sheets=sheets, k=limit)
+        elapsed = (time.perf_counter() - start) * 1000
+
+    if not results.empty:
+        st.caption(f"{len(results)} results in {elapsed:.1f} ms over {len(index)} objects")
+        st.dataframe(results, hide_index=True,
+                     column_config={"Score": st.column_config.NumberColumn(format="%.2f")})
+    else:
+        st.warning(f"No results for '{query}'.")
+else:
+    st.info(f"Type a word, the beginning of a word or an ATT&CK ID to search {len(index)} objects.")
+
+finish_run()